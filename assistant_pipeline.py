@@ -5,14 +5,18 @@ High-level entrypoint for all embedding operations in the EmbedCore system.
 This module orchestrates the complete pipeline from message input to secure storage.
 """
 
+import functools
 import logging
 import os
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, NamedTuple, Optional
+from datetime import datetime, timezone
 
 # Import required modules
-from embedcore_v3 import generate_embedding, obfuscate, deobfuscate
-from keystore import KeyStore
+from embedcore_v3 import generate_embedding, deobfuscate
+from embedcore_v3_numba import obfuscate, _derive_transform
+from keystore import keystore
 from embed_logger import save_embedding, log_to_csv
 
 # Configure logging with environment variable control
@@ -20,18 +24,158 @@ from embed_logger import save_embedding, log_to_csv
 # Valid values: "DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"
 # Default level: "INFO"
 log_level_str = os.environ.get('EMBEDCORE_LOG_LEVEL', 'INFO').upper()
-log_level_map = {
-    'DEBUG': logging.DEBUG,
-    'INFO': logging.INFO,
-    'WARNING': logging.WARNING,
-    'ERROR': logging.ERROR,
-    'CRITICAL': logging.CRITICAL
-}
-log_level = log_level_map.get(log_level_str, logging.INFO)  # Default to INFO if invalid
+log_level = getattr(logging, log_level_str, logging.INFO)
+if not isinstance(log_level, int):
+    log_level = logging.INFO  # Default to INFO if invalid
 
 # Set up logging
+logging.basicConfig(level=log_level)
 logger = logging.getLogger(__name__)
-logger.setLevel(log_level)
+logger.setLevel(log_level)  # basicConfig is a no-op if the root logger is already configured
+
+# Shared pool for the independent database and CSV writes in process_message
+_IO_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="embedcore-io")
+
+
+# Cached user keys are re-read from the keystore at least this often (seconds),
+# so rotations made by another process are picked up
+_USER_KEY_TTL = 60.0
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_user_key(user_id: str, key_version: int, ttl_bucket: int) -> str:
+    """Keystore lookup behind _get_user_key, memoized per (user, key version, TTL window)."""
+    user_key_bytes = keystore.get_key(user_id)
+    
+    # If no key exists, generate one
+    if user_key_bytes is None:
+        logger.info("No existing key found for user %s, generating new key", user_id)
+        user_key_bytes = keystore.generate_key(user_id)
+    
+    return user_key_bytes.decode()
+
+
+def _get_user_key(user_id: str) -> str:
+    """
+    Fetch (or create) a user's key and decode it for obfuscation.
+    
+    Results are memoized so repeat messages skip the keystore lookup and
+    decryption. The cache key includes keystore.key_version, so any rotation
+    through this process's keystore takes effect immediately, and a TTL
+    window, so rotations from other processes take effect within
+    _USER_KEY_TTL seconds.
+    """
+    return _cached_user_key(user_id, keystore.key_version, int(time.monotonic() // _USER_KEY_TTL))
+
+# Embedding shared by every empty or whitespace-only message, computed once
+_EMPTY_EMBEDDING = tuple(generate_embedding(""))
+
+
+class ProcessResult(NamedTuple):
+    """Immutable, tuple-backed result of a successful pipeline run."""
+    status: str
+    embedding: List[float]
+    obfuscated_embedding: List[float]
+    user_id: str
+    session_id: str
+    platform: str
+    timestamp: str
+
+
+def rotate_user_key(user_id: str) -> Optional[bytes]:
+    """
+    Rotate a user's key and drop any cached copy of the old key.
+    
+    Args:
+        user_id (str): Unique identifier for the user
+        
+    Returns:
+        bytes: The new user key
+    """
+    new_key = keystore.rotate_key(user_id)
+    _cached_user_key.cache_clear()
+    _derive_transform.cache_clear()
+    return new_key
+
+
+def _validate_inputs(user_id: str, session_id: str, platform: str, message_text: str) -> None:
+    """
+    Validate process_message inputs in a single pass.
+    
+    Raises:
+        TypeError: If any input is not a string
+        ValueError: If user_id, session_id or platform is empty
+    """
+    fields = (("user_id", user_id), ("session_id", session_id), ("platform", platform))
+    if (type(user_id) is str and type(session_id) is str and type(platform) is str
+            and type(message_text) is str and user_id and session_id and platform):
+        return
+    
+    # Slow path: work out which check failed, in the documented order
+    for name, value in fields + (("message_text", message_text),):
+        if not isinstance(value, str):
+            raise TypeError(f"{name} must be a string")
+    for name, value in fields:
+        if not value:
+            raise ValueError(f"{name} cannot be empty")
+
+
+def _run_pipeline(user_id: str, session_id: str, platform: str, message_text: str, timestamp: str) -> ProcessResult:
+    """Run steps 1-5 of the pipeline on validated inputs."""
+    logger.info("Processing message for user %s, session %s", user_id, session_id)
+    
+    # Step 1: Generate deterministic embedding (blank messages reuse a precomputed one)
+    if not message_text or message_text.isspace():
+        embedding = list(_EMPTY_EMBEDDING)
+        logger.debug("Blank message, using precomputed empty embedding")
+    else:
+        embedding = generate_embedding(message_text)
+        logger.debug("Generated embedding with %d dimensions", len(embedding))
+    
+    # Step 2: Fetch or create user-specific encryption key
+    user_key = _get_user_key(user_id)
+    logger.debug("Retrieved user key for obfuscation")
+    
+    # Step 3: Obfuscate embedding with user key
+    obfuscated_embedding = obfuscate(embedding, user_key)
+    logger.debug("Obfuscated embedding with user key")
+    
+    # Steps 4 and 5: Save to database and CSV concurrently
+    db_future = _IO_POOL.submit(save_embedding, user_id, session_id, obfuscated_embedding, platform)
+    csv_future = _IO_POOL.submit(log_to_csv, user_id, session_id, platform, obfuscated_embedding)
+    
+    db_success = db_future.result()
+    if not db_success:
+        logger.warning("Failed to save embedding to database for user %s", user_id)
+    
+    csv_success = csv_future.result()
+    if not csv_success:
+        logger.warning("Failed to save embedding to CSV for user %s", user_id)
+    
+    return ProcessResult("success", embedding, obfuscated_embedding, user_id, session_id, platform, timestamp)
+
+
+def process_message_result(user_id: str, session_id: str, platform: str, message_text: str) -> ProcessResult:
+    """
+    Process a message and return a ProcessResult instead of a dict.
+    
+    Same pipeline as process_message(), for high-throughput callers that
+    want a single immutable allocation per message. Unlike process_message(),
+    processing errors are raised rather than folded into an error response.
+    
+    Args:
+        user_id (str): Unique identifier for the user
+        session_id (str): Session identifier
+        platform (str): Platform identifier (e.g., "whatsapp", "web", "mobile")
+        message_text (str): The text message to process
+        
+    Returns:
+        ProcessResult: Result with the same fields as process_message()'s success response
+    """
+    _validate_inputs(user_id, session_id, platform, message_text)
+    result = _run_pipeline(user_id, session_id, platform, message_text, datetime.now(timezone.utc).isoformat())
+    logger.info("Successfully processed message for user %s", user_id)
+    return result
 
 
 def process_message(user_id: str, session_id: str, platform: str, message_text: str) -> Dict[str, Any]:
@@ -66,80 +210,26 @@ def process_message(user_id: str, session_id: str, platform: str, message_text:
         Exception: For any other processing errors
     """
     # Input validation
-    if not isinstance(user_id, str):
-        raise TypeError("user_id must be a string")
-    if not isinstance(session_id, str):
-        raise TypeError("session_id must be a string")
-    if not isinstance(platform, str):
-        raise TypeError("platform must be a string")
-    if not isinstance(message_text, str):
-        raise TypeError("message_text must be a string")
-    if not user_id:
-        raise ValueError("user_id cannot be empty")
-    if not session_id:
-        raise ValueError("session_id cannot be empty")
-    if not platform:
-        raise ValueError("platform cannot be empty")
+    _validate_inputs(user_id, session_id, platform, message_text)
+    
+    # Stamp the request once; both the success and error responses reuse it
+    timestamp = datetime.now(timezone.utc).isoformat()
     
     try:
-        logger.info(f"Processing message for user {user_id}, session {session_id}")
-        
-        # Step 1: Generate deterministic embedding
-        embedding = generate_embedding(message_text)
-        logger.debug(f"Generated embedding with {len(embedding)} dimensions")
-        
-        # Step 2: Fetch or create user-specific encryption key
-        keystore = KeyStore()
-        user_key_bytes = keystore.get_key(user_id)
-        
-        # If no key exists, generate one
-        if user_key_bytes is None:
-            logger.info(f"No existing key found for user {user_id}, generating new key")
-            user_key_bytes = keystore.generate_key(user_id)
-        
-        # Decode key for use in obfuscation
-        user_key = user_key_bytes.decode()
-        logger.debug("Retrieved user key for obfuscation")
-        
-        # Step 3: Obfuscate embedding with user key
-        obfuscated_embedding = obfuscate(embedding, user_key)
-        logger.debug("Obfuscated embedding with user key")
-        
-        # Step 4: Save to database
-        db_success = save_embedding(user_id, session_id, obfuscated_embedding, platform)
-        if not db_success:
-            logger.warning(f"Failed to save embedding to database for user {user_id}")
-        
-        # Step 5: Save to CSV
-        csv_success = log_to_csv(user_id, session_id, platform, obfuscated_embedding)
-        if not csv_success:
-            logger.warning(f"Failed to save embedding to CSV for user {user_id}")
+        response = _run_pipeline(user_id, session_id, platform, message_text, timestamp)._asdict()
         
-        # Step 6: Create response
-        timestamp = datetime.now().isoformat()
-        
-        response = {
-            "status": "success",
-            "embedding": embedding,
-            "obfuscated_embedding": obfuscated_embedding,
-            "user_id": user_id,
-            "session_id": session_id,
-            "platform": platform,
-            "timestamp": timestamp
-        }
-        
-        logger.info(f"Successfully processed message for user {user_id}")
+        logger.info("Successfully processed message for user %s", user_id)
         return response
         
     except Exception as e:
-        logger.error(f"Error processing message for user {user_id}: {e}")
+        logger.error("Error processing message for user %s: %s", user_id, e)
         return {
             "status": "error",
             "error_message": str(e),
             "user_id": user_id,
             "session_id": session_id,
             "platform": platform,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": timestamp
         }
 
 
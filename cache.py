@@ -1,64 +1,93 @@
+import sys
 import time
-import hashlib
 import json
-from typing import Any, Optional
+import functools
+import threading
+from typing import Any, Hashable, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 class CacheManager:
-    """Simple in-memory cache manager with TTL support."""
+    """Simple in-memory cache manager with TTL support.
+
+    Entries are spread over a fixed number of shards, each guarded by its
+    own lock, so concurrent callers rarely contend on the same lock.
+    """
+
+    NUM_SHARDS = 16
 
     def __init__(self):
-        self._cache = {}
+        self._shards = [({}, threading.Lock()) for _ in range(self.NUM_SHARDS)]
         self.enabled = True
 
-    def _make_key(self, key: str) -> str:
-        """Create a consistent cache key."""
-        return hashlib.md5(key.encode()).hexdigest()
+    def _make_key(self, key: Hashable) -> Hashable:
+        """Create a consistent cache key.
+
+        Dict lookups already hash the key, so string keys are only interned.
+        """
+        if type(key) is str:
+            return sys.intern(key)
+        return key
 
-    def get(self, key: str) -> Optional[Any]:
+    def _get_shard(self, cache_key: Hashable):
+        """Return the (dict, lock) shard that owns a cache key."""
+        return self._shards[hash(cache_key) & (self.NUM_SHARDS - 1)]
+
+    def get(self, key: Hashable) -> Optional[Any]:
         """Get value from cache if not expired."""
         if not self.enabled:
             return None
 
         cache_key = self._make_key(key)
-        if cache_key in self._cache:
-            value, expiry = self._cache[cache_key]
+        shard, lock = self._get_shard(cache_key)
+        with lock:
+            entry = shard.get(cache_key)
+            if entry is None:
+                return None
+            value, expiry = entry
             if time.time() < expiry:
                 return value
-            else:
-                # Expired, remove it
-                del self._cache[cache_key]
+            # Expired, remove it
+            del shard[cache_key]
         return None
 
-    def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
+    def set(self, key: Hashable, value: Any, ttl: int = 3600) -> bool:
         """Set value in cache with TTL (time to live in seconds)."""
         if not self.enabled:
             return False
 
         cache_key = self._make_key(key)
         expiry = time.time() + ttl
-        self._cache[cache_key] = (value, expiry)
+        shard, lock = self._get_shard(cache_key)
+        with lock:
+            shard[cache_key] = (value, expiry)
         return True
 
-    def delete(self, key: str) -> bool:
+    def delete(self, key: Hashable) -> bool:
         """Delete key from cache."""
         cache_key = self._make_key(key)
-        if cache_key in self._cache:
-            del self._cache[cache_key]
-            return True
-        return False
+        shard, lock = self._get_shard(cache_key)
+        with lock:
+            return shard.pop(cache_key, None) is not None
 
     def flush(self):
         """Clear all cache entries."""
-        self._cache.clear()
+        for shard, lock in self._shards:
+            with lock:
+                shard.clear()
 
     def stats(self) -> dict:
         """Get cache statistics."""
-        total_entries = len(self._cache)
+        total_entries = 0
+        valid_entries = 0
         current_time = time.time()
-        valid_entries = sum(1 for _, expiry in self._cache.values() if current_time < expiry)
+        # Snapshot one shard at a time rather than holding every lock
+        for shard, lock in self._shards:
+            with lock:
+                expiries = [expiry for _, expiry in shard.values()]
+            total_entries += len(expiries)
+            valid_entries += sum(1 for expiry in expiries if current_time < expiry)
         return {
             "total_entries": total_entries,
             "valid_entries": valid_entries,
@@ -68,15 +97,32 @@ class CacheManager:
 # Global instance
 cache_manager = CacheManager()
 
+def _make_call_key(func, args: tuple, kwargs: dict) -> Hashable:
+    """Build a cache key from a function and its call arguments.
+
+    Argument types are part of the key, as with functools.lru_cache(typed=True),
+    so f(1), f(1.0) and f(True) are cached separately even though they compare equal.
+    """
+    kwarg_items = tuple(sorted(kwargs.items()))
+    key = (func.__module__, func.__qualname__, args, kwarg_items,
+           tuple(type(arg) for arg in args), tuple(type(v) for _, v in kwarg_items))
+    try:
+        hash(key)
+    except TypeError:
+        # Unhashable arguments (lists, dicts) fall back to their string form
+        key_parts = [func.__qualname__]
+        key_parts.extend(str(arg) for arg in args)
+        key_parts.extend(f"{k}:{v}" for k, v in kwargs.items())
+        key = "|".join(key_parts)
+    return key
+
 def cached(ttl: int = 3600):
     """Decorator for caching function results."""
     def decorator(func):
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # Create cache key from function name and arguments
-            key_parts = [func.__name__]
-            key_parts.extend(str(arg) for arg in args)
-            key_parts.extend(f"{k}:{v}" for k, v in kwargs.items())
-            cache_key = "|".join(key_parts)
+            # Key on the raw arguments rather than stringifying each of them
+            cache_key = _make_call_key(func, args, kwargs)
 
             # Try to get from cache
             cached_result = cache_manager.get(cache_key)
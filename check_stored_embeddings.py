@@ -1,27 +1,49 @@
 import sqlite3
-import json
+import numpy as np
+
+# Try to use orjson for faster float-array parsing, with fallback
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+def _decode_vector(value) -> np.ndarray:
+    """Decode a stored vector from either a float64 BLOB or legacy JSON text."""
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=np.float64)
+    return np.asarray(json_loads(value), dtype=np.float64)
+
 
 def check_stored_embeddings(db_path: str = "assistant_core.db"):
     """Check and display stored embeddings in the database."""
     try:
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
         
-        # Get all embeddings
-        cursor.execute("SELECT trace_id, text, vector_json, created_at FROM embeddings")
-        rows = cursor.fetchall()
+        # Newer tables store vectors in a BLOB column, older ones as JSON text
+        columns = {col[1] for col in conn.execute("PRAGMA table_info(embeddings)")}
+        vector_column = "vector_blob" if "vector_blob" in columns else "vector_json"
         
-        print(f"Found {len(rows)} stored embeddings:")
+        print("Stored embeddings:")
         print("-" * 50)
         
-        for row in rows:
-            trace_id, text, vector_json, created_at = row
-            vector = json.loads(vector_json)
+        # Stream rows one at a time instead of materializing the whole table
+        total = 0
+        for trace_id, text, vector_data, created_at in conn.execute(
+            f"SELECT trace_id, text, {vector_column}, created_at FROM embeddings"
+        ):
+            vector = _decode_vector(vector_data)
+            non_zero_count = int(np.count_nonzero(vector))
             print(f"Trace ID: {trace_id}")
             print(f"Text: {text}")
-            print(f"Vector length: {len(vector)}")
+            print(f"Vector length: {vector.size}")
+            zero_pct = 100.0 * (1 - non_zero_count / vector.size) if vector.size else 0.0
+            print(f"Non-zero values: {non_zero_count}/{vector.size} ({zero_pct:.1f}% zero)")
+            print(f"First non-zero values: {vector[vector != 0.0][:5].round(4).tolist()}")
             print(f"Created at: {created_at}")
             print("-" * 30)
+            total += 1
+        
+        print(f"Found {total} stored embeddings")
         
         conn.close()
         return True
@@ -10,6 +10,12 @@ class CircuitBreakerState(Enum):
     OPEN = "open"         # Failing, requests rejected
     HALF_OPEN = "half_open"  # Testing if service recovered
 
+# Integer state codes used internally so the hot-path compare is int == int
+_CLOSED = 0
+_OPEN = 1
+_HALF_OPEN = 2
+_STATE_ENUMS = (CircuitBreakerState.CLOSED, CircuitBreakerState.OPEN, CircuitBreakerState.HALF_OPEN)
+
 class CircuitBreakerOpenException(Exception):
     """Exception raised when circuit breaker is open."""
     pass
@@ -25,27 +31,29 @@ class CircuitBreaker:
         self.recovery_timeout = recovery_timeout
         self.expected_exception = expected_exception
 
-        self._state = CircuitBreakerState.CLOSED
+        self._state = _CLOSED
         self._failure_count = 0
         self._last_failure_time = None
         self._success_count = 0
+        # Monotonic clock: immune to wall-clock jumps and cheaper than time.time()
+        self._clock = time.monotonic
 
     def _can_attempt_reset(self) -> bool:
         """Check if enough time has passed to attempt reset."""
         if self._last_failure_time is None:
             return False
-        return time.time() - self._last_failure_time >= self.recovery_timeout
+        return self._clock() - self._last_failure_time >= self.recovery_timeout
 
     def _reset(self):
         """Reset circuit breaker to closed state."""
-        self._state = CircuitBreakerState.CLOSED
+        self._state = _CLOSED
         self._failure_count = 0
         self._success_count = 0
         logger.info("Circuit breaker reset to CLOSED state")
 
     def _record_success(self):
         """Record a successful operation."""
-        if self._state == CircuitBreakerState.HALF_OPEN:
+        if self._state == _HALF_OPEN:
             self._success_count += 1
             # Require a few successes before fully resetting
             if self._success_count >= 2:
@@ -54,22 +62,30 @@ class CircuitBreaker:
     def _record_failure(self):
         """Record a failed operation."""
         self._failure_count += 1
-        self._last_failure_time = time.time()
+        self._last_failure_time = self._clock()
 
-        if self._state == CircuitBreakerState.HALF_OPEN:
+        if self._state == _HALF_OPEN:
             # Failed again, go back to open
-            self._state = CircuitBreakerState.OPEN
+            self._state = _OPEN
             logger.warning("Circuit breaker returned to OPEN state")
         elif self._failure_count >= self.failure_threshold:
             # Threshold reached, open circuit
-            self._state = CircuitBreakerState.OPEN
-            logger.warning(f"Circuit breaker opened after {self._failure_count} failures")
+            self._state = _OPEN
+            logger.warning("Circuit breaker opened after %d failures", self._failure_count)
 
     def call(self, func: Callable, *args, **kwargs) -> Any:
         """Execute function with circuit breaker protection."""
-        if self._state == CircuitBreakerState.OPEN:
+        if self._state == _CLOSED:
+            # Fast path: successes in CLOSED state need no bookkeeping
+            try:
+                return func(*args, **kwargs)
+            except self.expected_exception:
+                self._record_failure()
+                raise
+
+        if self._state == _OPEN:
             if self._can_attempt_reset():
-                self._state = CircuitBreakerState.HALF_OPEN
+                self._state = _HALF_OPEN
                 logger.info("Circuit breaker testing recovery (HALF_OPEN)")
             else:
                 raise CircuitBreakerOpenException("Circuit breaker is OPEN")
@@ -78,14 +94,14 @@ class CircuitBreaker:
             result = func(*args, **kwargs)
             self._record_success()
             return result
-        except self.expected_exception as e:
+        except self.expected_exception:
             self._record_failure()
-            raise e
+            raise
 
     @property
     def state(self) -> CircuitBreakerState:
         """Get current circuit breaker state."""
-        return self._state
+        return _STATE_ENUMS[self._state]
 
     @property
     def failure_count(self) -> int:
@@ -6,12 +6,25 @@ This script runs a comprehensive set of tests on the embedding generation and st
 """
 
 import sqlite3
-import json
 import numpy as np
 from datetime import datetime
 from embedcore_v3 import generate_embedding, obfuscate, deobfuscate
 from keystore import KeyStore
 
+# Shared connection reused by every test that touches the database
+_CONN = None
+
+
+def _get_test_connection(db_path: str = "assistant_core.db") -> sqlite3.Connection:
+    """Return the shared test connection, opening it in WAL mode on first use."""
+    global _CONN
+    if _CONN is None:
+        _CONN = sqlite3.connect(db_path, check_same_thread=False)
+        _CONN.executescript(
+            "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA temp_store=MEMORY;"
+        )
+    return _CONN
+
 def test_embedding_consistency():
     """Test that the same input always produces the same embedding."""
     print("Testing embedding consistency...")
@@ -72,16 +85,17 @@ def test_database_storage():
     # Generate a key for the user
     user_key = keystore.generate_key(user_id)
     
-    # Generate embedding
-    text = "Test text for database storage"
-    embedding = generate_embedding(text)
-    
-    # Obfuscate embedding
-    obfuscated = obfuscate(embedding, user_key.decode())
+    # Generate and obfuscate embeddings for a small batch of texts
+    texts = [
+        "Test text for database storage",
+        "Second text stored in the same transaction",
+        "Third text stored in the same transaction"
+    ]
+    embeddings = [generate_embedding(text) for text in texts]
+    obfuscated = [obfuscate(embedding, user_key.decode()) for embedding in embeddings]
     
     # Store in database
-    db_path = "assistant_core.db"
-    conn = sqlite3.connect(db_path)
+    conn = _get_test_connection()
     cursor = conn.cursor()
     
     # Create table if it doesn't exist
@@ -90,45 +104,44 @@ def test_database_storage():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             trace_id TEXT NOT NULL UNIQUE,
             text TEXT NOT NULL,
-            vector_json TEXT NOT NULL,
+            vector_blob BLOB NOT NULL,
             created_at TEXT NOT NULL
         )
     ''')
     
-    # Insert data
-    trace_id = f"test_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
-    vector_json = json.dumps(obfuscated)
+    # Insert all rows in a single transaction
+    trace_prefix = f"test_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
     created_at = datetime.now().isoformat()
-    
-    cursor.execute('''
-        INSERT INTO embeddings (trace_id, text, vector_json, created_at)
-        VALUES (?, ?, ?, ?)
-    ''', (trace_id, text, vector_json, created_at))
-    
-    conn.commit()
-    conn.close()
+    # Stored as raw float64 bytes so the round trip stays lossless
+    rows = [
+        (f"{trace_prefix}_{i}", text, sqlite3.Binary(np.asarray(vector, dtype=np.float64).tobytes()), created_at)
+        for i, (text, vector) in enumerate(zip(texts, obfuscated))
+    ]
+    
+    with conn:
+        cursor.executemany('''
+            INSERT INTO embeddings (trace_id, text, vector_blob, created_at)
+            VALUES (?, ?, ?, ?)
+        ''', rows)
     
     # Retrieve from database
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT vector_json FROM embeddings WHERE trace_id = ?", (trace_id,))
-    row = cursor.fetchone()
-    
-    assert row is not None, "Should find the stored embedding"
-    
-    retrieved_obfuscated_json = row[0]
-    retrieved_obfuscated = json.loads(retrieved_obfuscated_json)
-    
-    # Deobfuscate
-    retrieved_deobfuscated = deobfuscate(retrieved_obfuscated, user_key.decode())
-    
-    # Check that retrieved embedding matches original (within floating point tolerance)
-    assert len(retrieved_deobfuscated) == len(embedding), "Length should match"
-    for i in range(len(embedding)):
-        assert abs(retrieved_deobfuscated[i] - embedding[i]) < 1e-10, f"Value at index {i} should match"
+    for (trace_id, _, _, _), embedding in zip(rows, embeddings):
+        cursor.execute("SELECT vector_blob FROM embeddings WHERE trace_id = ?", (trace_id,))
+        row = cursor.fetchone()
+        
+        assert row is not None, "Should find the stored embedding"
+        
+        retrieved_obfuscated = np.frombuffer(row[0], dtype=np.float64).tolist()
+        
+        # Deobfuscate
+        retrieved_deobfuscated = deobfuscate(retrieved_obfuscated, user_key.decode())
+        
+        # Check that retrieved embedding matches original (within floating point tolerance)
+        assert len(retrieved_deobfuscated) == len(embedding), "Length should match"
+        for i in range(len(embedding)):
+            assert abs(retrieved_deobfuscated[i] - embedding[i]) < 1e-10, f"Value at index {i} should match"
     
-    conn.close()
+    cursor.close()
     print("✓ Database storage test passed")
 
 def test_edge_cases():
@@ -1,43 +1,51 @@
 import os
+from dataclasses import dataclass, field
 from typing import Optional
 
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Production configuration settings."""
+    """Production configuration settings, read from the environment on instantiation."""
     
     # Database settings
-    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///assistant_core.db")
-    DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", "10"))
-    DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", "20"))
+    DATABASE_URL: str = field(default_factory=lambda: os.getenv("DATABASE_URL", "sqlite:///assistant_core.db"))
+    DATABASE_POOL_SIZE: int = field(default_factory=lambda: int(os.getenv("DATABASE_POOL_SIZE", "10")))
+    DATABASE_MAX_OVERFLOW: int = field(default_factory=lambda: int(os.getenv("DATABASE_MAX_OVERFLOW", "20")))
     
     # Redis settings
-    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-    REDIS_TTL: int = int(os.getenv("REDIS_TTL", "3600"))  # 1 hour default
+    REDIS_URL: str = field(default_factory=lambda: os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    REDIS_TTL: int = field(default_factory=lambda: int(os.getenv("REDIS_TTL", "3600")))  # 1 hour default
     
     # Pinecone settings
-    PINECONE_API_KEY: Optional[str] = os.getenv("PINECONE_API_KEY")
-    PINECONE_ENVIRONMENT: str = os.getenv("PINECONE_ENVIRONMENT", "us-west1-gcp")
-    PINECONE_INDEX_NAME: str = os.getenv("PINECONE_INDEX_NAME", "assistant-embeddings")
+    PINECONE_API_KEY: Optional[str] = field(default_factory=lambda: os.getenv("PINECONE_API_KEY"))
+    PINECONE_ENVIRONMENT: str = field(default_factory=lambda: os.getenv("PINECONE_ENVIRONMENT", "us-west1-gcp"))
+    PINECONE_INDEX_NAME: str = field(default_factory=lambda: os.getenv("PINECONE_INDEX_NAME", "assistant-embeddings"))
     
     # Model settings
-    MODEL_NAME: str = os.getenv("MODEL_NAME", "all-MiniLM-L6-v2")
-    MODEL_CACHE_DIR: str = os.getenv("MODEL_CACHE_DIR", "/tmp/sentence_transformers")
+    MODEL_NAME: str = field(default_factory=lambda: os.getenv("MODEL_NAME", "all-MiniLM-L6-v2"))
+    MODEL_CACHE_DIR: str = field(default_factory=lambda: os.getenv("MODEL_CACHE_DIR", "/tmp/sentence_transformers"))
+    # "sentence-transformers" or "onnx-int8" (needs optimum[onnxruntime])
+    MODEL_BACKEND: str = field(default_factory=lambda: os.getenv("MODEL_BACKEND", "sentence-transformers"))
+    EMBEDDING_BATCH_SIZE: int = field(default_factory=lambda: int(os.getenv("EMBEDDING_BATCH_SIZE", "64")))
+    EMBEDDING_CACHE_SIZE: int = field(default_factory=lambda: int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")))
     
     # Security settings
-    SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-    ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    SECRET_KEY: str = field(default_factory=lambda: os.getenv("SECRET_KEY", "your-secret-key-change-in-production"))
+    ALGORITHM: str = field(default_factory=lambda: os.getenv("ALGORITHM", "HS256"))
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = field(default_factory=lambda: int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")))
     
     # Rate limiting
-    RATE_LIMIT: str = os.getenv("RATE_LIMIT", "100/minute")
+    RATE_LIMIT: str = field(default_factory=lambda: os.getenv("RATE_LIMIT", "100/minute"))
     
     # Logging
-    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
-    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_LEVEL: str = field(default_factory=lambda: os.getenv("LOG_LEVEL", "INFO"))
+    LOG_FORMAT: str = field(default_factory=lambda: os.getenv("LOG_FORMAT", "json"))
     
     # Health check
-    HEALTH_CHECK_TIMEOUT: int = int(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+    HEALTH_CHECK_TIMEOUT: int = field(default_factory=lambda: int(os.getenv("HEALTH_CHECK_TIMEOUT", "5")))
     
     # RL Agent
-    RL_AGENT_URL: str = os.getenv("RL_AGENT_URL", "http://127.0.0.1:8787")
+    RL_AGENT_URL: str = field(default_factory=lambda: os.getenv("RL_AGENT_URL", "http://127.0.0.1:8787"))
+
 
 config = Config()
\ No newline at end of file
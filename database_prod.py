@@ -1,31 +1,132 @@
+import array
+import json
 import sqlite3
 import logging
-from typing import List, Dict, Any, Optional
-from contextlib import contextmanager
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+# Try to import sqlite-vec, with fallback
+try:
+    import sqlite_vec
+    SQLITE_VEC_AVAILABLE = True
+except ImportError:
+    SQLITE_VEC_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Element type of vectors stored in embeddings.vector_blob
+VECTOR_DTYPE = np.float32
+
+# Width of the embeddings_vec KNN index; vectors of any other length are not indexed
+VECTOR_DIMENSION = 384
+_VECTOR_BLOB_SIZE = VECTOR_DIMENSION * np.dtype(VECTOR_DTYPE).itemsize
+
+# Indexes backing the recent-N, per-endpoint and per-summary lookups
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_embeddings_timestamp ON embeddings(timestamp DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_metrics_endpoint_ts ON metrics(endpoint, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_summary ON tasks(summary_id)",
+)
+
+# bulk_ingest_embeddings only drops and rebuilds the timestamp index when a
+# batch is larger than this fraction of the rows already stored
+_BULK_REINDEX_FRACTION = 0.25
+
+_UPSERT_EMBEDDING = '''
+    INSERT INTO embeddings (item_type, item_id, vector_blob, timestamp, text_content)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(item_type, item_id) DO UPDATE SET
+        vector_blob = excluded.vector_blob,
+        timestamp = excluded.timestamp,
+        text_content = excluded.text_content
+    RETURNING id
+'''
+
+# Prepared statements kept per connection; pooled connections live long enough to reuse them
+_STATEMENT_CACHE_SIZE = 256
+
+# Applied once to every pooled connection when it is opened. mmap_size covers
+# vector tables up to 1 GiB; the mapping is shared through the OS page cache,
+# so unlike cache_size it is not paid again per pooled connection.
+_CONNECTION_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA wal_autocheckpoint=1000;
+    PRAGMA busy_timeout=5000;
+    PRAGMA foreign_keys=ON;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=1073741824;
+"""
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    """Serialize a vector to raw float32 bytes for the vector_blob column."""
+    if isinstance(vector, array.array) and vector.typecode == 'f':
+        return vector.tobytes()
+    return np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+
+def unpack_vector(value: Union[bytes, str]) -> np.ndarray:
+    """Decode a vector_blob value, accepting rows written as legacy JSON text."""
+    if isinstance(value, (bytes, memoryview)):
+        return np.frombuffer(value, dtype=VECTOR_DTYPE)
+    return np.asarray(json.loads(value), dtype=VECTOR_DTYPE)
+
+
+def _load_vec_extension(conn: sqlite3.Connection) -> bool:
+    """Load sqlite-vec into conn; False if this Python's sqlite3 cannot load extensions."""
+    try:
+        conn.enable_load_extension(True)
+        try:
+            sqlite_vec.load(conn)
+        finally:
+            conn.enable_load_extension(False)
+        return True
+    except (AttributeError, sqlite3.Error) as e:
+        logger.warning("sqlite-vec could not be loaded: %s", e)
+        return False
+
+
 class DatabaseManager:
     """Production database manager with connection pooling and error handling."""
 
     def __init__(self, db_path: str = "assistant_core.db", max_connections: int = 10):
         self.db_path = db_path
         self.max_connections = max_connections
-        self._connection_pool = []
-        self._pool_lock = None  # In production, use threading.Lock()
+        self._connection_pool = deque()
+        self._pool_lock = threading.Lock()
+        # All writes are serialized through one thread and one connection
+        self._write_queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._writer_thread: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        # Connection of the transaction() block open on the current thread, if any
+        self._local = threading.local()
+        # True once embeddings_vec exists and every connection loads sqlite-vec
+        self.vec_enabled = False
 
     def initialize(self):
         """Initialize the database and create tables."""
+        # Pooled connections switch the file to WAL with synchronous=NORMAL on open,
+        # so the schema below is created outside the rollback-journal/FULL-sync path
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
+            # Apply all DDL in one write transaction
+            cursor.execute("BEGIN IMMEDIATE")
+
             # Create embeddings table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS embeddings (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     item_type TEXT NOT NULL,
                     item_id TEXT NOT NULL,
-                    vector_blob TEXT NOT NULL,
+                    vector_blob BLOB NOT NULL,
                     timestamp TEXT NOT NULL,
                     text_content TEXT,
                     UNIQUE(item_type, item_id)
@@ -33,10 +134,9 @@ class DatabaseManager:
             ''')
 
             # Add text_content column if it doesn't exist
-            try:
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(embeddings)")}
+            if "text_content" not in columns:
                 cursor.execute("ALTER TABLE embeddings ADD COLUMN text_content TEXT")
-            except sqlite3.OperationalError:
-                pass
 
             # Create other required tables
             cursor.execute('''
@@ -86,6 +186,15 @@ class DatabaseManager:
                 )
             ''')
 
+            # Model outputs keyed by SHA-256 of (model name, text), reused across runs
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    content_hash BLOB PRIMARY KEY,
+                    vector_blob BLOB NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            ''')
+
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS metrics (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -96,22 +205,180 @@ class DatabaseManager:
                 )
             ''')
 
-            conn.commit()
-            logger.info(f"Database initialized at {self.db_path}")
+            # Create indexes; skip any whose table predates the expected schema
+            for statement in _INDEXES:
+                try:
+                    cursor.execute(statement)
+                except sqlite3.OperationalError as e:
+                    logger.warning("Skipping index (%s): %s", e, statement)
+
+            # Refresh planner statistics only for tables whose statistics are
+            # missing or stale (0x10002 checks every table, not just those this
+            # connection has queried); analysis_limit caps the rows each scan reads
+            cursor.execute("PRAGMA analysis_limit=400")
+            cursor.execute("PRAGMA optimize=0x10002")
+
+            cursor.execute("COMMIT")
+            logger.info("Database initialized at %s", self.db_path)
+
+            self.vec_enabled = SQLITE_VEC_AVAILABLE and self._prepare_vec_index(conn)
+
+    def _prepare_vec_index(self, conn: sqlite3.Connection) -> bool:
+        """
+        Create the embeddings_vec KNN index keyed by embeddings.id and backfill it.
+
+        Returns:
+            bool: True if embeddings are mirrored into embeddings_vec
+        """
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS embeddings_vec USING vec0(
+                    embedding float[{VECTOR_DIMENSION}] distance_metric=cosine
+                )
+            ''')
+            # Drop entries whose embeddings row was deleted outside DatabaseManager
+            # (ids are never reused) and rows without text, which are never results
+            conn.execute('''
+                DELETE FROM embeddings_vec WHERE rowid NOT IN (
+                    SELECT id FROM embeddings WHERE text_content IS NOT NULL AND text_content != ''
+                )
+            ''')
+            # Index rows stored before the table existed (raw float32 blobs only)
+            conn.execute('''
+                INSERT INTO embeddings_vec (rowid, embedding)
+                SELECT id, vector_blob FROM embeddings
+                WHERE typeof(vector_blob) = 'blob' AND length(vector_blob) = ?
+                  AND text_content IS NOT NULL AND text_content != ''
+                  AND id NOT IN (SELECT rowid FROM embeddings_vec)
+            ''', (_VECTOR_BLOB_SIZE,))
+            conn.execute("COMMIT")
+            return True
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            logger.warning("sqlite-vec index unavailable, using a full scan for search: %s", e)
+            return False
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """Open a new long-lived connection configured for pooled use."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                               cached_statements=_STATEMENT_CACHE_SIZE)
+        conn.executescript(_CONNECTION_PRAGMAS)
+        if SQLITE_VEC_AVAILABLE:
+            _load_vec_extension(conn)
+        return conn
 
     @contextmanager
     def _get_connection(self):
         """Get a database connection from pool."""
-        conn = sqlite3.connect(self.db_path)
+        with self._pool_lock:
+            conn = self._connection_pool.pop() if self._connection_pool else None
+        if conn is None:
+            conn = self._create_connection()
+
         try:
             yield conn
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            # Return to the pool (most recently used first); close any overflow
+            with self._pool_lock:
+                if len(self._connection_pool) < self.max_connections:
+                    self._connection_pool.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def _writer_loop(self):
+        """Drain the write queue on a single dedicated connection."""
+        conn = self._create_connection()
+        try:
+            while True:
+                item = self._write_queue.get()
+                if item is None:
+                    break
+                func, atomic, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if atomic:
+                        conn.execute("BEGIN IMMEDIATE")
+                    result = func(conn)
+                    if atomic:
+                        conn.execute("COMMIT")
+                    future.set_result(result)
+                except BaseException as e:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    future.set_exception(e)
         finally:
             conn.close()
 
+    def _submit_write(self, func: Callable[[sqlite3.Connection], Any], atomic: bool = False) -> Any:
+        """
+        Run func(conn) on the writer thread and wait for its result.
+
+        With atomic=True, func runs inside its own BEGIN IMMEDIATE/COMMIT. Inside
+        a transaction() block, func runs directly on that block's connection and
+        becomes part of its transaction instead.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return func(conn)
+
+        with self._writer_lock:
+            if self._writer_thread is None or not self._writer_thread.is_alive():
+                self._writer_thread = threading.Thread(
+                    target=self._writer_loop, name="db-writer", daemon=True
+                )
+                self._writer_thread.start()
+            future: Future = Future()
+            self._write_queue.put((func, atomic, future))
+        return future.result()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group several writes into one durable commit.
+
+        execute_update, execute_many, bulk_ingest_embeddings and execute_query
+        calls made on this thread inside the block share one connection and one
+        BEGIN IMMEDIATE/COMMIT; an exception rolls all of them back. Nested
+        blocks join the outermost transaction.
+        """
+        if getattr(self._local, "conn", None) is not None:
+            yield self._local.conn
+            return
+
+        with self._get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.conn = conn
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            finally:
+                self._local.conn = None
+
+    def close(self):
+        """Stop the writer thread and close every idle pooled connection."""
+        with self._writer_lock:
+            if self._writer_thread is not None:
+                self._write_queue.put(None)
+                self._writer_thread.join()
+                self._writer_thread = None
+        with self._pool_lock:
+            while self._connection_pool:
+                self._connection_pool.pop().close()
+
     def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[tuple]:
         """Execute a SELECT query and return results."""
         try:
-            with self._get_connection() as conn:
+            # Inside transaction(), read through its connection to see pending writes
+            txn_conn = getattr(self._local, "conn", None)
+            with (nullcontext(txn_conn) if txn_conn is not None else self._get_connection()) as conn:
                 cursor = conn.cursor()
                 if params:
                     cursor.execute(query, params)
@@ -119,7 +386,7 @@ class DatabaseManager:
                     cursor.execute(query)
                 return cursor.fetchall()
         except Exception as e:
-            logger.error(f"Database query error: {e}")
+            logger.error("Database query error: %s", e)
             raise
 
     def execute_query_all(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[tuple]:
@@ -128,17 +395,162 @@ class DatabaseManager:
 
     def execute_update(self, query: str, params: Optional[Dict[str, Any]] = None) -> int:
         """Execute an INSERT/UPDATE/DELETE query and return affected rows."""
+        def _update(conn: sqlite3.Connection) -> int:
+            cursor = conn.execute(query, params) if params else conn.execute(query)
+            return cursor.rowcount
+
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                if params:
-                    cursor.execute(query, params)
-                else:
-                    cursor.execute(query)
-                conn.commit()
-                return cursor.rowcount
+            return self._submit_write(_update)
+        except Exception as e:
+            logger.error("Database update error: %s", e)
+            raise
+
+    def execute_many(self, query: str, seq_of_params: Iterable[Union[Dict[str, Any], Sequence[Any]]]) -> int:
+        """Execute an INSERT/UPDATE/DELETE once per parameter set in a single transaction."""
+        def _update_many(conn: sqlite3.Connection) -> int:
+            return conn.executemany(query, seq_of_params).rowcount
+
+        try:
+            # Connections are in autocommit mode; run the batch atomically so it commits once
+            return self._submit_write(_update_many, atomic=True)
+        except Exception as e:
+            logger.error("Database batch update error: %s", e)
+            raise
+
+    @staticmethod
+    def _index_vectors(conn: sqlite3.Connection, rows: Iterable[Sequence[Any]]) -> None:
+        """
+        Replace the embeddings_vec entries for (id, vector_blob, text_content) rows.
+
+        Rows without text are removed from the index rather than indexed: the
+        k nearest neighbours are chosen before knn_search joins back to
+        embeddings, so an indexed empty-text row would take a result slot.
+        """
+        rows = list(rows)
+        # vec0 has no upsert, so stale entries are deleted first
+        conn.executemany("DELETE FROM embeddings_vec WHERE rowid = ?", [(row[0],) for row in rows])
+        conn.executemany("INSERT INTO embeddings_vec (rowid, embedding) VALUES (?, ?)", [
+            (row_id, blob) for row_id, blob, text in rows
+            if text and isinstance(blob, bytes) and len(blob) == _VECTOR_BLOB_SIZE
+        ])
+
+    def upsert_embedding(self, item_type: str, item_id: str, vector_blob: bytes,
+                         timestamp: str, text_content: Optional[str]) -> int:
+        """
+        Insert or replace one embedding and keep its embeddings_vec entry in step.
+
+        Returns:
+            The embeddings.id of the stored row
+        """
+        def _upsert(conn: sqlite3.Connection) -> int:
+            row_id = conn.execute(
+                _UPSERT_EMBEDDING, (item_type, item_id, vector_blob, timestamp, text_content)
+            ).fetchone()[0]
+            if self.vec_enabled:
+                self._index_vectors(conn, [(row_id, vector_blob, text_content)])
+            return row_id
+
+        try:
+            return self._submit_write(_upsert, atomic=True)
+        except Exception as e:
+            logger.error("Embedding upsert error: %s", e)
+            raise
+
+    def knn_search(self, query_blob: bytes, k: int, exclude_summary_id: Optional[str] = None) -> List[tuple]:
+        """
+        Return up to k stored embeddings nearest to a float32 query by cosine distance.
+
+        Rows are (item_type, item_id, text_content, distance), nearest first;
+        rows without text are kept out of the index, so only the summary
+        exclude_summary_id can be dropped after the k neighbours are found
+        (callers ask for one extra). Only valid when vec_enabled;
+        the MATCH ... AND k = ? form is what sqlite-vec answers from the index
+        on any SQLite (vec0 only sees a LIMIT from 3.41 on), a
+        vec_distance_cosine() in SELECT would scan. embeddings_vec uses
+        distance_metric=cosine, so distance is 1 - cosine similarity.
+        """
+        return self.execute_query('''
+            WITH knn AS (
+                SELECT rowid, distance FROM embeddings_vec
+                WHERE embedding MATCH :query AND k = :k
+            )
+            SELECT e.item_type, e.item_id, e.text_content, knn.distance
+            FROM knn JOIN embeddings e ON e.id = knn.rowid
+            WHERE e.text_content IS NOT NULL AND e.text_content != ''
+              AND (:exclude IS NULL OR NOT (e.item_type = 'summary' AND e.item_id = :exclude))
+            ORDER BY knn.distance
+        ''', {"query": query_blob, "k": k, "exclude": exclude_summary_id})
+
+    def bulk_ingest_embeddings(self, rows: Iterable[Sequence[Any]]) -> int:
+        """
+        Insert or replace many embeddings in one transaction.
+
+        Each row is (item_type, item_id, vector_blob, timestamp, text_content).
+        A batch larger than _BULK_REINDEX_FRACTION of the stored rows is first
+        loaded into an unindexed staging table, then merged into embeddings
+        with a single key-ordered upsert, so the unique index is updated in
+        key order rather than once per random insert; the timestamp index is
+        dropped for the merge and rebuilt in one pass. Smaller batches are
+        upserted row by row so an incremental batch does not rebuild an index
+        over the whole table. When an (item_type, item_id) appears more than
+        once, the last row wins. The embeddings_vec index, when enabled, is
+        refreshed for the merged rows.
+
+        Returns:
+            Number of rows merged into embeddings
+        """
+        rows = list(rows)
+
+        def _upsert_rows(conn: sqlite3.Connection) -> int:
+            indexed = {}
+            for row in rows:
+                indexed[conn.execute(_UPSERT_EMBEDDING, row).fetchone()[0]] = (row[2], row[4])
+            if self.vec_enabled:
+                self._index_vectors(conn, [(row_id, blob, text) for row_id, (blob, text) in indexed.items()])
+            return len(indexed)
+
+        def _ingest(conn: sqlite3.Connection) -> int:
+            # The highest id is one rowid lookup and an upper bound on the row count
+            stored = conn.execute("SELECT MAX(id) FROM embeddings").fetchone()[0]
+            if stored and len(rows) <= stored * _BULK_REINDEX_FRACTION:
+                return _upsert_rows(conn)
+
+            conn.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS embeddings_staging (
+                    item_type TEXT, item_id TEXT, vector_blob BLOB, timestamp TEXT, text_content TEXT
+                )
+            ''')
+            conn.execute("DELETE FROM embeddings_staging")
+            conn.executemany("INSERT INTO embeddings_staging VALUES (?, ?, ?, ?, ?)", rows)
+
+            conn.execute("DROP INDEX IF EXISTS idx_embeddings_timestamp")
+            cursor = conn.execute('''
+                INSERT INTO embeddings (item_type, item_id, vector_blob, timestamp, text_content)
+                SELECT item_type, item_id, vector_blob, timestamp, text_content
+                FROM embeddings_staging
+                WHERE rowid IN (SELECT MAX(rowid) FROM embeddings_staging GROUP BY item_type, item_id)
+                ORDER BY item_type, item_id
+                ON CONFLICT(item_type, item_id) DO UPDATE SET
+                    vector_blob = excluded.vector_blob,
+                    timestamp = excluded.timestamp,
+                    text_content = excluded.text_content
+            ''')
+            merged = cursor.rowcount
+            conn.execute(_INDEXES[0])
+
+            if self.vec_enabled:
+                self._index_vectors(conn, conn.execute('''
+                    SELECT e.id, e.vector_blob, e.text_content FROM embeddings e
+                    WHERE (e.item_type, e.item_id) IN (SELECT item_type, item_id FROM embeddings_staging)
+                ''').fetchall())
+
+            conn.execute("DELETE FROM embeddings_staging")
+            return merged
+
+        try:
+            return self._submit_write(_ingest, atomic=True)
         except Exception as e:
-            logger.error(f"Database update error: {e}")
+            logger.error("Bulk embedding ingest error: %s", e)
             raise
 
 # Global instance
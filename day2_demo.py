@@ -12,12 +12,14 @@ import sys
 import json
 from datetime import datetime
 
+import numpy as np
+
 # Add the parent directory to the path so we can import our modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from embedcore_v3 import generate_embedding, obfuscate, deobfuscate
 from keystore import generate_key, get_key
-from embed_logger import log_embedding, save_embedding
+from embed_logger import log_embedding, save_embedding, flush_csv_log
 
 
 def demo_day2_functionality():
@@ -76,17 +78,20 @@ def demo_day2_functionality():
         
         # Check if roundtrip is successful
         tolerance = 1e-10
-        is_reversible = all(abs(a - b) < tolerance for a, b in zip(embedding, restored_embedding))
+        is_reversible = np.allclose(embedding, restored_embedding, rtol=0.0, atol=tolerance)
         print(f"   ✓ Obfuscation reversibility: {'PASS' if is_reversible else 'FAIL'}\n")
         
         # Step 7: Show logged data
         print("7. Checking logged data...")
         
         # Check CSV
-        if os.path.exists("embedding_log.csv"):
+        flush_csv_log()
+        try:
             with open("embedding_log.csv", "r") as f:
-                lines = f.readlines()
-                print(f"   ✓ CSV entries: {len(lines) - 1}")  # Subtract 1 for header
+                line_count = sum(1 for _ in f)
+                print(f"   ✓ CSV entries: {line_count - 1}")  # Subtract 1 for header
+        except FileNotFoundError:
+            print("   CSV file not found")
         
         # Check database
         import sqlite3
@@ -9,6 +9,30 @@ It shows how a message flows through the system from input to secure storage.
 import json
 import os
 from assistant_pipeline import process_message
+from embed_logger import flush_csv_log
+
+
+def _read_last_csv_row(path: str, block_size: int = 4096):
+    """
+    Return the last row of a CSV file without reading the whole file.
+    
+    Reads backwards from the end in growing blocks until a full line is
+    available. Returns None when the file holds no data rows.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        while True:
+            start = max(0, size - block_size)
+            f.seek(start)
+            tail = f.read().rstrip(b"\r\n")
+            if start == 0 or b"\n" in tail:
+                break
+            block_size *= 2
+    
+    if b"\n" not in tail:
+        return None  # Only the header (or nothing) is present
+    return tail.rsplit(b"\n", 1)[-1].decode("utf-8").strip()
 
 
 def demo_pipeline():
@@ -54,22 +78,22 @@ def demo_pipeline():
         print(f"   Session ID: {result['session_id']}")
         print(f"   Platform: {result['platform']}")
         print(f"   Timestamp: {result['timestamp']}")
-        print("   Obfuscated embedding: [stored as JSON]\n")
+        print("   Obfuscated embedding: [stored as float64 bytes]\n")
         
         # Display CSV entry
         print("4. CSV Entry:")
-        if os.path.exists("embedding_log.csv"):
+        flush_csv_log()
+        try:
             # Read the last line of the CSV
-            with open("embedding_log.csv", "r") as f:
-                lines = f.readlines()
-                if len(lines) > 1:
-                    last_line = lines[-1].strip()
-                    print(f"   Appended to: embedding_log.csv")
-                    print(f"   Last entry: {last_line}")
-                else:
-                    print("   CSV file exists but is empty")
-        else:
+            last_line = _read_last_csv_row("embedding_log.csv")
+        except FileNotFoundError:
             print("   CSV file not found")
+        else:
+            if last_line is not None:
+                print(f"   Appended to: embedding_log.csv")
+                print(f"   Last entry: {last_line}")
+            else:
+                print("   CSV file exists but is empty")
         
         print("\n=== Demo Complete ===")
         return True
@@ -6,7 +6,6 @@ This script helps debug issues with embedding storage in the database.
 """
 
 import sqlite3
-import json
 from datetime import datetime
 
 def debug_embedding_storage(db_path: str = "assistant_core.db"):
@@ -45,21 +44,29 @@ def debug_embedding_storage(db_path: str = "assistant_core.db"):
         # Show sample data
         if count > 0:
             print("\nSample embeddings:")
-            cursor.execute("""
-                SELECT trace_id, text, vector_json, created_at 
+            # Newer tables store raw float64 bytes in vector_blob, older ones JSON text.
+            # Let SQLite work out the dimension so no vector is decoded: 8 bytes per
+            # element for blobs, one more element than there are commas for JSON.
+            vector_column = "vector_blob" if "vector_blob" in {col[1] for col in columns} else "vector_json"
+            conn.row_factory = sqlite3.Row
+            samples = conn.execute(f"""
+                SELECT trace_id, text, created_at,
+                       CASE typeof({vector_column})
+                           WHEN 'blob' THEN length({vector_column}) / 8
+                           ELSE length({vector_column}) - length(replace({vector_column}, ',', '')) + 1
+                       END AS vector_length
                 FROM embeddings 
                 ORDER BY created_at DESC 
                 LIMIT 3
-            """)
-            samples = cursor.fetchall()
+            """).fetchall()
             
-            for i, (trace_id, text, vector_json, created_at) in enumerate(samples, 1):
-                vector = json.loads(vector_json)
+            for i, row in enumerate(samples, 1):
+                text = row["text"]
                 print(f"\nSample {i}:")
-                print(f"  Trace ID: {trace_id}")
+                print(f"  Trace ID: {row['trace_id']}")
                 print(f"  Text: {text[:50]}{'...' if len(text) > 50 else ''}")
-                print(f"  Vector length: {len(vector)}")
-                print(f"  Created at: {created_at}")
+                print(f"  Vector length: {row['vector_length']}")
+                print(f"  Created at: {row['created_at']}")
         
         conn.close()
         print("\n✓ Debug completed successfully")
@@ -89,22 +96,14 @@ def clear_embeddings(db_path: str = "assistant_core.db"):
             conn.close()
             return True
         
-        # Count before deletion
-        cursor.execute("SELECT COUNT(*) FROM embeddings")
-        count_before = cursor.fetchone()[0]
-        
-        # Delete all records
-        cursor.execute("DELETE FROM embeddings")
-        conn.commit()
-        
-        # Count after deletion
-        cursor.execute("SELECT COUNT(*) FROM embeddings")
-        count_after = cursor.fetchone()[0]
+        # Delete all records in one transaction; rowcount reports how many went
+        with conn:
+            cursor.execute("DELETE FROM embeddings")
+            count_cleared = cursor.rowcount
         
         conn.close()
         
-        print(f"Cleared {count_before} embeddings")
-        print(f"Remaining embeddings: {count_after}")
+        print(f"Cleared {count_cleared} embeddings")
         print("✓ Clear operation completed")
         return True
         
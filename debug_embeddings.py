@@ -5,7 +5,13 @@ Debug Embeddings Utility
 This script helps debug the embedding generation process.
 """
 
-import json
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+import numpy as np
+
 from embedcore_v3 import generate_embedding, obfuscate, deobfuscate
 
 def debug_embedding_generation(text: str, key: str = "debug_key"):
@@ -17,14 +23,16 @@ def debug_embedding_generation(text: str, key: str = "debug_key"):
         # Generate embedding
         print("1. Generating embedding...")
         embedding = generate_embedding(text)
-        print(f"   ✓ Generated embedding with {len(embedding)} dimensions")
-        print(f"   First 5 values: {embedding[:5]}")
+        original_arr = np.asarray(embedding)
+        print(f"   ✓ Generated embedding with {original_arr.size} dimensions")
+        print(f"   First 5 values: {np.round(original_arr[:5], 4).tolist()}")
         
         # Obfuscate embedding
         print("\n2. Obfuscating embedding...")
         obfuscated = obfuscate(embedding, key)
-        print(f"   ✓ Obfuscated embedding with {len(obfuscated)} dimensions")
-        print(f"   First 5 values: {obfuscated[:5]}")
+        obfuscated_arr = np.asarray(obfuscated)
+        print(f"   ✓ Obfuscated embedding with {obfuscated_arr.size} dimensions")
+        print(f"   First 5 values: {np.round(obfuscated_arr[:5], 4).tolist()}")
         
         # Deobfuscate embedding
         print("\n3. Deobfuscating embedding...")
@@ -33,21 +41,27 @@ def debug_embedding_generation(text: str, key: str = "debug_key"):
         
         # Verify reversibility
         print("\n4. Verifying reversibility...")
-        is_reversible = True
-        for i in range(len(embedding)):
-            if abs(embedding[i] - deobfuscated[i]) > 1e-10:
-                print(f"   ❌ Mismatch at index {i}: {embedding[i]} vs {deobfuscated[i]}")
-                is_reversible = False
-                break
-        
-        if is_reversible:
+        restored_arr = np.asarray(deobfuscated)
+        mismatch = np.abs(original_arr - restored_arr) > 1e-10
+        is_reversible = not mismatch.any()
+        if not is_reversible:
+            # Only the first few differences are materialized for the report
+            idx = np.flatnonzero(mismatch)[:5]
+            diffs = zip(idx.tolist(), original_arr[idx].tolist(), restored_arr[idx].tolist())
+            for i, orig, rest in diffs:
+                print(f"   ❌ Mismatch at index {i}: {orig} vs {rest}")
+            print(f"   {int(mismatch.sum())} of {mismatch.size} values differ")
+        else:
             print("   ✓ Obfuscation is perfectly reversible")
         
         # Show statistics
         print("\n5. Embedding statistics:")
-        print(f"   Min value: {min(embedding)}")
-        print(f"   Max value: {max(embedding)}")
-        print(f"   Mean value: {sum(embedding) / len(embedding)}")
+        print(f"   Min value: {original_arr.min()}")
+        print(f"   Max value: {original_arr.max()}")
+        print(f"   Mean value: {original_arr.mean()}")
+        non_zero = int(np.count_nonzero(original_arr))
+        zero_pct = 100.0 * (1 - non_zero / original_arr.size) if original_arr.size else 0.0
+        print(f"   Non-zero values: {non_zero}/{original_arr.size} ({zero_pct:.1f}% zero)")
         
         print("\n✓ Debug completed successfully")
         return True
@@ -56,6 +70,13 @@ def debug_embedding_generation(text: str, key: str = "debug_key"):
         print(f"❌ Debug failed: {e}")
         return False
 
+def _debug_case(text: str):
+    """Run debug_embedding_generation in a worker, capturing its report."""
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        success = debug_embedding_generation(text)
+    return success, buffer.getvalue()
+
 def debug_multiple_texts():
     """Debug embedding generation for multiple texts."""
     test_texts = [
@@ -69,9 +90,14 @@ def debug_multiple_texts():
     print("Debugging multiple texts...")
     print("=" * 50)
     
-    for i, text in enumerate(test_texts, 1):
+    # The cases are independent and CPU-bound, so run them in parallel and
+    # print each captured report in order
+    with ProcessPoolExecutor(max_workers=min(len(test_texts), os.cpu_count() or 1)) as pool:
+        results = list(pool.map(_debug_case, test_texts))
+    
+    for i, (text, (success, report)) in enumerate(zip(test_texts, results), 1):
         print(f"\nTest {i}: '{text[:30]}{'...' if len(text) > 30 else ''}'")
-        success = debug_embedding_generation(text)
+        print(report, end="")
         if not success:
             return False
     
@@ -2,12 +2,31 @@ import sqlite3
 import json
 import csv
 import os
+import atexit
 import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from contextlib import contextmanager
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
 from logging import getLogger
-import math
+
+import numpy as np
+
+# Try to import numba, with fallback
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Try to import sqlite-vec, with fallback
+try:
+    import sqlite_vec
+    SQLITE_VEC_AVAILABLE = True
+except ImportError:
+    SQLITE_VEC_AVAILABLE = False
 
 # Configure logging with environment variable control
 # Set EMBEDCORE_LOG_LEVEL environment variable to control logging level
@@ -27,6 +46,147 @@ log_level = log_level_map.get(log_level_str, logging.INFO)  # Default to INFO if
 logger = logging.getLogger(__name__)
 logger.setLevel(log_level)
 
+# Standard embedding dimension for sentence transformers
+EMBEDDING_DIMENSION = 384
+
+# Persistent, buffered CSV log. Rows are flushed every _CSV_FLUSH_EVERY writes
+# and on interpreter shutdown; call flush_csv_log() before reading the file.
+_CSV_PATH = "embedding_log.csv"
+_CSV_BUFFER_SIZE = 1 << 20
+_CSV_FLUSH_EVERY = int(os.environ.get('EMBEDCORE_CSV_FLUSH_EVERY', '64'))
+_csv_lock = threading.Lock()
+_csv_file = None
+_csv_writer = None
+_csv_pending = 0
+
+# Long-lived SQLite connection (and its write lock) per database path
+_CONN_CACHE: dict = {}
+_CONN_CACHE_LOCK = threading.Lock()
+
+# Database paths whose embeddings schema has been verified this process
+_SCHEMA_CHECKED: set = set()
+_SCHEMA_LOCK = threading.Lock()
+
+# Single prepared statement shared by every insert so sqlite3 reuses the parse
+_INSERT_EMBEDDING_SQL = (
+    "INSERT INTO embeddings (user_id, session_id, timestamp, platform, obfuscated_embedding) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+# Database paths whose connection has the sqlite-vec memory_vectors table
+_VEC_READY: set = set()
+
+# Embeddings already validated by the log_embedding call running on this thread
+_validation_state = threading.local()
+
+# Last formatted timestamp as (epoch milliseconds, ISO string)
+_LAST_TS = (0, "")
+
+# Runs the database and CSV sinks of log_embedding side by side
+_LOG_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="embed-log")
+
+
+@contextmanager
+def _validated_scope(*embeddings: List[float]):
+    """Treat these exact embedding objects as valid for the duration of the block."""
+    previous = getattr(_validation_state, 'embeddings', None)
+    _validation_state.embeddings = {id(e): e for e in embeddings}
+    try:
+        yield
+    finally:
+        _validation_state.embeddings = previous
+
+
+def _is_prevalidated(embedding_data: List[float]) -> bool:
+    """True if embedding_data is one of the objects in the current validated scope."""
+    scope = getattr(_validation_state, 'embeddings', None)
+    return scope is not None and scope.get(id(embedding_data)) is embedding_data
+
+
+def _now_iso() -> str:
+    """
+    Current local time in ISO 8601 with millisecond precision.
+    
+    The formatted string is reused for every call within the same millisecond.
+    """
+    global _LAST_TS
+    t = time.time()
+    ms = int(t * 1000)
+    cached = _LAST_TS
+    if cached[0] == ms:
+        return cached[1]
+    stamp = datetime.fromtimestamp(t).isoformat(timespec='milliseconds')
+    _LAST_TS = (ms, stamp)
+    return stamp
+
+
+# Status codes returned by _validate_fast
+_VALID, _NAN, _INF, _ALL_ZERO, _UNIFORM, _LOW_VARIANCE = range(6)
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _validate_fast(arr: np.ndarray):
+        """
+        Check a float64 vector in one compiled loop.
+        
+        Returns (status, index): the first failing check as a status code and,
+        for NaN/infinite values, the offending index (-1 otherwise).
+        """
+        amin = np.inf
+        amax = -np.inf
+        mean = 0.0
+        m2 = 0.0
+        for i in range(arr.shape[0]):
+            x = arr[i]
+            if np.isnan(x):
+                return _NAN, i
+            if np.isinf(x):
+                return _INF, i
+            if x < amin:
+                amin = x
+            if x > amax:
+                amax = x
+            # Welford update: variance without a second pass
+            delta = x - mean
+            mean += delta / (i + 1)
+            m2 += delta * (x - mean)
+        
+        if max(-amin, amax) < 1e-10:
+            return _ALL_ZERO, -1
+        if amax - amin < 1e-10:
+            return _UNIFORM, -1
+        if m2 / arr.shape[0] < 1e-12:
+            return _LOW_VARIANCE, -1
+        return _VALID, -1
+else:
+    def _validate_fast(arr: np.ndarray):
+        """
+        Check a float64 vector with NumPy reductions.
+        
+        Returns (status, index): the first failing check as a status code and,
+        for NaN/infinite values, the offending index (-1 otherwise).
+        """
+        finite = np.isfinite(arr)
+        if not finite.all():
+            i = int(np.argmin(finite))
+            return (_NAN if np.isnan(arr[i]) else _INF), i
+        
+        amin = float(arr.min())
+        amax = float(arr.max())
+        if max(-amin, amax) < 1e-10:
+            return _ALL_ZERO, -1
+        if amax - amin < 1e-10:
+            return _UNIFORM, -1
+        if float(arr.var()) < 1e-12:
+            return _LOW_VARIANCE, -1
+        return _VALID, -1
+
+
+if NUMBA_AVAILABLE:
+    # Compile (or load from cache) now rather than on the first log event
+    _validate_fast(np.linspace(-1.0, 1.0, EMBEDDING_DIMENSION))
+
 
 def _validate_embedding(embedding_data: List[float], user_id: str, session_id: str, platform: str) -> bool:
     """
@@ -43,70 +203,66 @@ def _validate_embedding(embedding_data: List[float], user_id: str, session_id: s
     Returns:
         bool: True if embedding is valid, False otherwise
     """
+    # Already validated by the enclosing log_embedding call
+    if _is_prevalidated(embedding_data):
+        return True
+    
     try:
         # Check if embedding is a list
         if not isinstance(embedding_data, list):
-            logger.warning(f"Invalid embedding type for user {user_id}: expected list, got {type(embedding_data)}")
+            logger.warning("Invalid embedding type for user %s: expected list, got %s", user_id, type(embedding_data))
             return False
         
         # Check if embedding is empty
         if len(embedding_data) == 0:
-            logger.warning(f"Empty embedding for user {user_id}")
+            logger.warning("Empty embedding for user %s", user_id)
             return False
             
         # Standard embedding dimension for sentence transformers
-        expected_dimension = 384
+        expected_dimension = EMBEDDING_DIMENSION
         
         # Check dimensionality
         if len(embedding_data) != expected_dimension:
-            logger.warning(f"Invalid embedding dimension for user {user_id}: expected {expected_dimension}, got {len(embedding_data)}")
+            logger.warning("Invalid embedding dimension for user %s: expected %d, got %d", user_id, expected_dimension, len(embedding_data))
             return False
         
-        # Validate each element is a valid float
-        for i, val in enumerate(embedding_data):
-            # Check for non-numeric values
-            if not isinstance(val, (int, float)):
-                logger.warning(f"Non-numeric value at index {i} for user {user_id}: {type(val)}")
-                return False
-                
-            # Check for NaN
-            if math.isnan(val):
-                logger.warning(f"NaN value at index {i} for user {user_id}")
-                return False
-                
-            # Check for infinity
-            if math.isinf(val):
-                logger.warning(f"Infinite value at index {i} for user {user_id}")
-                return False
+        # Convert once; the remaining checks run in a single kernel call
+        arr = np.asarray(embedding_data)
+        if arr.ndim != 1 or arr.dtype.kind not in "biuf":
+            logger.warning("Non-numeric values in embedding for user %s: %s", user_id, arr.dtype)
+            return False
+        arr = np.ascontiguousarray(arr, dtype=np.float64)
+        
+        status, i = _validate_fast(arr)
+        
+        # Check for NaN and infinity
+        if status == _NAN or status == _INF:
+            kind = "NaN" if status == _NAN else "Infinite"
+            logger.warning("%s value at index %d for user %s", kind, i, user_id)
+            return False
         
         # Check for all-zero vector
-        all_zero = all(abs(val) < 1e-10 for val in embedding_data)
-        if all_zero:
-            logger.warning(f"All-zero embedding detected for user {user_id}")
+        if status == _ALL_ZERO:
+            logger.warning("All-zero embedding detected for user %s", user_id)
             return False
         
         # Check for uniform values (all elements are the same)
-        first_val = embedding_data[0]
-        uniform = all(abs(val - first_val) < 1e-10 for val in embedding_data)
-        if uniform:
-            logger.warning(f"Uniform embedding detected for user {user_id} (all values = {first_val})")
+        if status == _UNIFORM:
+            logger.warning("Uniform embedding detected for user %s (all values = %s)", user_id, embedding_data[0])
             return False
         
-        # Check for sufficient variance (at least one value must differ meaningfully)
-        mean_val = sum(embedding_data) / len(embedding_data)
-        variance = sum((val - mean_val) ** 2 for val in embedding_data) / len(embedding_data)
-        std_dev = variance ** 0.5
-        
-        if std_dev < 1e-6:
-            logger.warning(f"Low variance embedding detected for user {user_id} (std dev = {std_dev})")
+        # Check for sufficient variance (std dev of at least 1e-6)
+        if status == _LOW_VARIANCE:
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning("Low variance embedding detected for user %s (std dev = %s)", user_id, float(arr.std()))
             return False
         
         # If we reach here, the embedding is valid
-        logger.debug(f"Embedding validation passed for user {user_id}")
+        logger.debug("Embedding validation passed for user %s", user_id)
         return True
         
     except Exception as e:
-        logger.error(f"Error during embedding validation for user {user_id}: {e}")
+        logger.error("Error during embedding validation for user %s: %s", user_id, e)
         return False
 
 
@@ -115,7 +271,9 @@ def save_embedding(user_id: str, session_id: str, embedding_data: List[float], p
     Save embedding data to the SQLite database.
     
     This function writes embedding data to the assistant_core.db SQLite database
-    in the embeddings table with full error handling and validation.
+    in the embeddings table with full error handling and validation. Element
+    values are checked by the validation pass; a non-numeric embedding is
+    rejected with a False return rather than an exception.
     
     Args:
         user_id (str): Unique identifier for the user
@@ -128,7 +286,7 @@ def save_embedding(user_id: str, session_id: str, embedding_data: List[float], p
         bool: True if successful, False otherwise
         
     Raises:
-        TypeError: If inputs are not of expected types
+        TypeError: If user_id, session_id or platform is not a string, or embedding_data is not a list
         ValueError: If required fields are empty
     """
     # Input validation
@@ -147,101 +305,299 @@ def save_embedding(user_id: str, session_id: str, embedding_data: List[float], p
     if not platform:
         raise ValueError("platform cannot be empty")
     
-    # Validate embedding data
-    for i, val in enumerate(embedding_data):
-        if not isinstance(val, (int, float)):
-            raise TypeError(f"embedding_data[{i}] must be numeric, got {type(val)}")
-    
-    # Perform strict embedding validation
+    # Perform strict embedding validation (also rejects non-numeric values)
     if not _validate_embedding(embedding_data, user_id, session_id, platform):
-        logger.warning(f"Embedding validation failed for user {user_id}, session {session_id}, platform {platform}")
+        logger.warning("Embedding validation failed for user %s, session %s, platform %s", user_id, session_id, platform)
         return False
     
     try:
-        # Convert embedding to JSON string
-        embedding_json = json.dumps(embedding_data)
+        # Pack embedding as raw float64 bytes
+        embedding_blob = _pack_embedding(embedding_data)
         
         # Get current timestamp in ISO 8601 format
-        timestamp = datetime.now().isoformat()
+        timestamp = _now_iso()
         
-        # Insert into database using context manager
-        with _get_db_connection(db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Try to create table with required schema
-            try:
-                cursor.execute('''
-                    CREATE TABLE embeddings (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id TEXT NOT NULL,
-                        session_id TEXT NOT NULL,
-                        timestamp TEXT NOT NULL,
-                        platform TEXT NOT NULL,
-                        obfuscated_embedding TEXT NOT NULL
-                    )
-                ''')
-                conn.commit()
-                logger.info("Created embeddings table with required schema")
-            except sqlite3.OperationalError as e:
-                # Table might already exist, check if it has the right schema
-                cursor.execute("PRAGMA table_info(embeddings)")
-                columns = [col[1] for col in cursor.fetchall()]
-                
-                required_columns = ['id', 'user_id', 'session_id', 'timestamp', 'platform', 'obfuscated_embedding']
-                if not all(col in columns for col in required_columns):
-                    # If the schema is wrong, we need to recreate the table
-                    logger.info("Recreating embeddings table with required schema")
-                    cursor.execute("DROP TABLE IF EXISTS embeddings")
-                    cursor.execute('''
-                        CREATE TABLE embeddings (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            user_id TEXT NOT NULL,
-                            session_id TEXT NOT NULL,
-                            timestamp TEXT NOT NULL,
-                            platform TEXT NOT NULL,
-                            obfuscated_embedding TEXT NOT NULL
-                        )
-                    ''')
-                conn.commit()
-            
-            # Insert data (using required schema)
-            cursor.execute('''
-                INSERT INTO embeddings (user_id, session_id, timestamp, platform, obfuscated_embedding)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (user_id, session_id, timestamp, platform, embedding_json))
-            
-            conn.commit()
-            logger.info(f"Successfully saved embedding for user {user_id}, session {session_id}")
-            return True
+        conn, lock = _get_cached_connection(db_path)
+        with lock, conn:
+            cursor = conn.execute(_INSERT_EMBEDDING_SQL, (user_id, session_id, timestamp, platform, embedding_blob))
+            if db_path in _VEC_READY:
+                _insert_vector(conn, cursor.lastrowid, embedding_data)
+        
+        logger.info("Successfully saved embedding for user %s, session %s", user_id, session_id)
+        return True
             
     except Exception as e:
-        logger.error(f"Failed to save embedding to database: {e}")
+        logger.error("Failed to save embedding to database: %s", e)
         return False
 
 
-@contextmanager
-def _get_db_connection(db_path: str):
+def _pack_embedding(embedding_data: List[float]) -> bytes:
+    """Serialize an embedding to raw float64 bytes for the obfuscated_embedding column."""
+    return np.asarray(embedding_data, dtype=np.float64).tobytes()
+
+
+def load_embedding(stored) -> List[float]:
     """
-    Context manager for database connections.
+    Decode an obfuscated_embedding value read from the embeddings table.
+    
+    New rows hold raw float64 bytes; rows written by older versions hold
+    JSON text. Both decode to the exact floats that were saved.
     
     Args:
-        db_path (str): Path to the database file
+        stored (bytes or str): Column value as returned by sqlite3
         
-    Yields:
-        sqlite3.Connection: Database connection object
+    Returns:
+        List[float]: The stored embedding
+    """
+    if isinstance(stored, bytes):
+        return np.frombuffer(stored, dtype=np.float64).tolist()
+    return json.loads(stored)
+
+
+def save_embeddings_batch(rows: Iterable[Tuple[str, str, List[float], str]], db_path: str = "assistant_core.db") -> int:
     """
-    conn = None
+    Save many embeddings to the SQLite database in a single transaction.
+    
+    Each row is validated like save_embedding(); invalid rows are skipped
+    with a warning and the rest are written with one executemany.
+    
+    Args:
+        rows: Iterable of (user_id, session_id, embedding_data, platform) tuples
+        db_path (str): Path to the database file (default: "assistant_core.db")
+        
+    Returns:
+        int: Number of rows saved (0 on database error)
+    """
+    timestamp = _now_iso()
+    params = []
+    vectors = []
+    for user_id, session_id, embedding_data, platform in rows:
+        if not _validate_embedding(embedding_data, user_id, session_id, platform):
+            logger.warning("Embedding validation failed for user %s, session %s, platform %s", user_id, session_id, platform)
+            continue
+        vectors.append(embedding_data)
+        params.append((user_id, session_id, timestamp, platform, _pack_embedding(embedding_data)))
+    
+    if not params:
+        return 0
+    
     try:
-        conn = sqlite3.connect(db_path)
-        yield conn
+        conn, lock = _get_cached_connection(db_path)
+        with lock, conn:
+            if db_path in _VEC_READY:
+                # Each row needs its id to key the vector table
+                for row, embedding_data in zip(params, vectors):
+                    cursor = conn.execute(_INSERT_EMBEDDING_SQL, row)
+                    _insert_vector(conn, cursor.lastrowid, embedding_data)
+            else:
+                conn.executemany(_INSERT_EMBEDDING_SQL, params)
+        
+        logger.info("Successfully saved %d embeddings", len(params))
+        return len(params)
+        
     except Exception as e:
-        if conn:
-            conn.rollback()
-        logger.error(f"Database connection error: {e}")
-        raise
-    finally:
-        if conn:
-            conn.close()
+        logger.error("Failed to save embedding batch to database: %s", e)
+        return 0
+
+
+def _get_cached_connection(db_path: str) -> Tuple[sqlite3.Connection, threading.Lock]:
+    """
+    Return the shared connection for db_path, opening it on first use.
+    
+    The connection is reused across calls and threads; callers must hold the
+    returned lock while using it. The embeddings schema is verified once per
+    database path by _ensure_schema().
+    
+    Args:
+        db_path (str): Path to the database file
+        
+    Returns:
+        Tuple[sqlite3.Connection, threading.Lock]: Connection and its lock
+    """
+    with _CONN_CACHE_LOCK:
+        entry = _CONN_CACHE.get(db_path)
+        if entry is None:
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            # WAL with synchronous=NORMAL skips the per-commit fsync: a power
+            # loss can drop the last few commits but cannot corrupt the file
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-20000")
+            entry = _CONN_CACHE[db_path] = (conn, threading.Lock())
+    
+    conn, lock = entry
+    _ensure_schema(conn, db_path, lock)
+    return entry
+
+
+def _ensure_schema(conn: sqlite3.Connection, db_path: str, lock: threading.Lock) -> None:
+    """
+    Create the embeddings table (and vector mirror) once per database path.
+    
+    After the first call for a path this is a set lookup, so the insert path
+    never issues schema statements.
+    
+    Raises:
+        RuntimeError: If the existing embeddings table has a different schema
+    """
+    if db_path in _SCHEMA_CHECKED:
+        return
+    
+    with _SCHEMA_LOCK:
+        if db_path in _SCHEMA_CHECKED:
+            return
+        with lock:
+            _prepare_embeddings_table(conn)
+            if SQLITE_VEC_AVAILABLE and _prepare_vector_table(conn):
+                _VEC_READY.add(db_path)
+        _SCHEMA_CHECKED.add(db_path)
+
+
+def _prepare_embeddings_table(conn: sqlite3.Connection) -> None:
+    """
+    Create the embeddings table if it does not exist.
+    
+    Raises:
+        RuntimeError: If an existing embeddings table is missing required columns
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS embeddings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            platform TEXT NOT NULL,
+            obfuscated_embedding BLOB NOT NULL
+        )
+    ''')
+    
+    # Table might have already existed; refuse to write into a different schema
+    cursor.execute("PRAGMA table_info(embeddings)")
+    columns = {col[1] for col in cursor.fetchall()}
+    
+    required_columns = ['id', 'user_id', 'session_id', 'timestamp', 'platform', 'obfuscated_embedding']
+    missing = [col for col in required_columns if col not in columns]
+    if missing:
+        raise RuntimeError(f"embeddings table is missing required columns: {', '.join(missing)}")
+    
+    # Per-user/session lookups and time-ordered scans
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_user_sess ON embeddings(user_id, session_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_ts ON embeddings(timestamp)")
+    conn.commit()
+
+
+def _prepare_vector_table(conn: sqlite3.Connection) -> bool:
+    """
+    Load sqlite-vec and create the memory_vectors table keyed by embeddings.id.
+    
+    Entries whose embeddings row has been deleted are dropped here; ids are
+    never reused, so they would otherwise stay in the table for good.
+    
+    Returns:
+        bool: True if vectors will be mirrored into memory_vectors
+    """
+    try:
+        conn.enable_load_extension(True)
+        try:
+            sqlite_vec.load(conn)
+        finally:
+            conn.enable_load_extension(False)
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS memory_vectors USING vec0(
+                embedding float[{EMBEDDING_DIMENSION}] distance_metric=cosine
+            )
+        ''')
+        conn.execute("DELETE FROM memory_vectors WHERE rowid NOT IN (SELECT id FROM embeddings)")
+        conn.commit()
+        return True
+    except (AttributeError, sqlite3.Error) as e:
+        logger.warning("sqlite-vec unavailable, falling back to NumPy search: %s", e)
+        return False
+
+
+def _insert_vector(conn: sqlite3.Connection, row_id: int, embedding_data: List[float]) -> None:
+    """Mirror an embedding into memory_vectors under its embeddings.id."""
+    conn.execute(
+        "INSERT INTO memory_vectors (rowid, embedding) VALUES (?, ?)",
+        (row_id, np.asarray(embedding_data, dtype=np.float32).tobytes())
+    )
+
+
+def search_embeddings(query_embedding: List[float], k: int = 10, db_path: str = "assistant_core.db") -> List[Tuple[int, float]]:
+    """
+    Find the stored embeddings closest to a query by cosine distance.
+    
+    Uses the sqlite-vec memory_vectors table when the extension is available,
+    otherwise scans the embeddings table with NumPy. The KNN query uses the
+    MATCH ... AND k = ? form, as database_prod.knn_search does, and joins back
+    to embeddings so ids deleted since the table was opened are never returned.
+    
+    Args:
+        query_embedding (List[float]): Query vector, in the same space as the stored embeddings
+        k (int): Maximum number of results (default: 10)
+        db_path (str): Path to the database file (default: "assistant_core.db")
+        
+    Returns:
+        List[Tuple[int, float]]: (embeddings.id, cosine distance) pairs, nearest first
+    """
+    if k <= 0:
+        return []
+    
+    query = np.asarray(query_embedding, dtype=np.float64)
+    conn, lock = _get_cached_connection(db_path)
+    
+    if db_path in _VEC_READY:
+        with lock:
+            rows = conn.execute('''
+                WITH knn AS (
+                    SELECT rowid, distance FROM memory_vectors
+                    WHERE embedding MATCH ? AND k = ?
+                )
+                SELECT knn.rowid, knn.distance
+                FROM knn JOIN embeddings e ON e.id = knn.rowid
+                ORDER BY knn.distance
+            ''', (query.astype(np.float32).tobytes(), k)).fetchall()
+        return [(row_id, float(distance)) for row_id, distance in rows]
+    
+    with lock:
+        rows = conn.execute("SELECT id, obfuscated_embedding FROM embeddings").fetchall()
+    rows = [(row_id, load_embedding(stored)) for row_id, stored in rows]
+    rows = [(row_id, vec) for row_id, vec in rows if len(vec) == len(query)]
+    if not rows:
+        return []
+    
+    ids = np.fromiter((row_id for row_id, _ in rows), dtype=np.int64, count=len(rows))
+    matrix = np.array([vec for _, vec in rows], dtype=np.float64)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    distances = 1.0 - (matrix @ query) / np.where(norms == 0, 1.0, norms)
+    
+    order = np.argsort(distances, kind="stable")[:k]
+    return [(int(ids[i]), float(distances[i])) for i in order]
+
+
+def _close_cached_connections() -> None:
+    """Optimize, checkpoint and close every cached database connection."""
+    with _CONN_CACHE_LOCK:
+        for conn, lock in _CONN_CACHE.values():
+            with lock:
+                try:
+                    # Refresh planner statistics for the new indexes, then fold
+                    # the WAL back into the database file
+                    conn.execute("PRAGMA optimize")
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except sqlite3.Error as e:
+                    logger.debug("Shutdown maintenance skipped: %s", e)
+                conn.close()
+        _CONN_CACHE.clear()
+        with _SCHEMA_LOCK:
+            _SCHEMA_CHECKED.clear()
+            _VEC_READY.clear()
+
+
+atexit.register(_close_cached_connections)
 
 
 def log_to_db(user_id: str, session_id: str, platform: str, obf_embedding: List[float]) -> bool:
@@ -262,12 +618,12 @@ def log_to_db(user_id: str, session_id: str, platform: str, obf_embedding: List[
     try:
         success = save_embedding(user_id, session_id, obf_embedding, platform)
         if success:
-            logger.info(f"Database logging successful for user {user_id}")
+            logger.info("Database logging successful for user %s", user_id)
         else:
-            logger.warning(f"Database logging failed for user {user_id}")
+            logger.warning("Database logging failed for user %s", user_id)
         return success
     except Exception as e:
-        logger.error(f"Error in database logging for user {user_id}: {e}")
+        logger.error("Error in database logging for user %s: %s", user_id, e)
         return False
 
 
@@ -288,7 +644,7 @@ def log_to_csv(user_id: str, session_id: str, platform: str, obf_embedding: List
     """
     # Perform strict embedding validation for CSV logging as well
     if not _validate_embedding(obf_embedding, user_id, session_id, platform):
-        logger.warning(f"Embedding validation failed for CSV logging for user {user_id}")
+        logger.warning("Embedding validation failed for CSV logging for user %s", user_id)
         return False
         
     try:
@@ -296,30 +652,114 @@ def log_to_csv(user_id: str, session_id: str, platform: str, obf_embedding: List
         embedding_json = json.dumps(obf_embedding)
         
         # Get current timestamp
-        timestamp = datetime.now().isoformat()
+        timestamp = _now_iso()
         
-        # Define CSV file path
-        csv_path = "embedding_log.csv"
+        _write_csv_row([timestamp, user_id, session_id, platform, embedding_json])
         
-        # Write to CSV file
-        file_exists = os.path.isfile(csv_path)
+        logger.info("Successfully logged to CSV for user %s", user_id)
+        return True
         
-        with open(csv_path, 'a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
+    except Exception as e:
+        logger.error("Failed to log to CSV for user %s: %s", user_id, e)
+        return False
+
+
+def _write_csv_row(row: list) -> None:
+    """Append a row to the shared CSV handle, opening it on first use."""
+    _write_csv_rows([row])
+
+
+def _write_csv_rows(rows: List[list]) -> None:
+    """Append rows to the shared CSV handle under a single lock acquisition."""
+    global _csv_file, _csv_writer, _csv_pending
+    
+    with _csv_lock:
+        if _csv_file is None:
+            _csv_file = open(_CSV_PATH, 'a', newline='', encoding='utf-8', buffering=_CSV_BUFFER_SIZE)
+            _csv_writer = csv.writer(_csv_file)
             
             # Write header if file is new
-            if not file_exists:
-                writer.writerow(['timestamp', 'user_id', 'session_id', 'platform', 'obfuscated_embedding'])
-            
-            # Write data row
-            writer.writerow([timestamp, user_id, session_id, platform, embedding_json])
+            if os.fstat(_csv_file.fileno()).st_size == 0:
+                _csv_writer.writerow(['timestamp', 'user_id', 'session_id', 'platform', 'obfuscated_embedding'])
         
-        logger.info(f"Successfully logged to CSV for user {user_id}")
-        return True
+        _csv_writer.writerows(rows)
+        _csv_pending += len(rows)
+        if _csv_pending >= _CSV_FLUSH_EVERY:
+            _csv_file.flush()
+            _csv_pending = 0
+
+
+def flush_csv_log(sync: bool = False) -> None:
+    """
+    Flush buffered CSV rows to disk.
+    
+    Args:
+        sync (bool): Also fsync the file so rows survive a crash
+    """
+    global _csv_pending
+    
+    with _csv_lock:
+        if _csv_file is None or _csv_file.closed:
+            return
+        _csv_file.flush()
+        _csv_pending = 0
+        if sync:
+            os.fsync(_csv_file.fileno())
+
+
+def _close_csv_log() -> None:
+    """Flush, fsync and close the shared CSV handle."""
+    global _csv_file, _csv_writer, _csv_pending
+    
+    flush_csv_log(sync=True)
+    with _csv_lock:
+        if _csv_file is not None:
+            _csv_file.close()
+        _csv_file = None
+        _csv_writer = None
+        _csv_pending = 0
+
+
+atexit.register(_close_csv_log)
+
+
+def _log_validated(sink, user_id: str, session_id: str, platform: str, obf_embedding: List[float]) -> bool:
+    """Run a logging sink on an embedding that log_embedding already validated."""
+    with _validated_scope(obf_embedding):
+        return sink(user_id, session_id, platform, obf_embedding)
+
+
+def _submit_sinks(user_id: str, session_id: str, platform: str, obf_embedding: List[float]) -> Tuple[Future, Future]:
+    """Submit the database and CSV writes for a validated embedding."""
+    db_future = _LOG_EXECUTOR.submit(_log_validated, log_to_db, user_id, session_id, platform, obf_embedding)
+    csv_future = _LOG_EXECUTOR.submit(_log_validated, log_to_csv, user_id, session_id, platform, obf_embedding)
+    return db_future, csv_future
+
+
+def log_embedding_async(user_id: str, session_id: str, platform: str, obf_embedding: List[float]) -> Tuple[Future, Future]:
+    """
+    Start logging embedding data to both database and CSV without waiting.
+    
+    The embedding is validated on the calling thread; the two writes then run
+    concurrently on a background pool.
+    
+    Args:
+        user_id (str): Unique identifier for the user
+        session_id (str): Session identifier
+        platform (str): Platform identifier
+        obf_embedding (List[float]): Obfuscated embedding data
         
-    except Exception as e:
-        logger.error(f"Failed to log to CSV for user {user_id}: {e}")
-        return False
+    Returns:
+        Tuple[Future, Future]: Futures resolving to the database and CSV success flags
+    """
+    if not _validate_embedding(obf_embedding, user_id, session_id, platform):
+        logger.warning("Embedding validation failed for unified logging for user %s", user_id)
+        db_future, csv_future = Future(), Future()
+        db_future.set_result(False)
+        csv_future.set_result(False)
+        return db_future, csv_future
+    
+    return _submit_sinks(user_id, session_id, platform, obf_embedding)
 
 
 def log_embedding(user_id: str, session_id: str, platform: str, obf_embedding: List[float]) -> dict:
@@ -328,6 +768,7 @@ def log_embedding(user_id: str, session_id: str, platform: str, obf_embedding: L
     
     This function ensures that errors in either logging mechanism don't break
     the main system by catching all exceptions and continuing execution.
+    The two writes run concurrently; the call returns once both finish.
     
     Args:
         user_id (str): Unique identifier for the user
@@ -340,7 +781,7 @@ def log_embedding(user_id: str, session_id: str, platform: str, obf_embedding: L
     """
     # Perform strict embedding validation before proceeding
     if not _validate_embedding(obf_embedding, user_id, session_id, platform):
-        logger.warning(f"Embedding validation failed for unified logging for user {user_id}")
+        logger.warning("Embedding validation failed for unified logging for user %s", user_id)
         return {
             'db_success': False,
             'csv_success': False,
@@ -355,23 +796,60 @@ def log_embedding(user_id: str, session_id: str, platform: str, obf_embedding: L
     }
     
     try:
-        # Log to database
-        status['db_success'] = log_to_db(user_id, session_id, platform, obf_embedding)
-        
-        # Log to CSV
-        status['csv_success'] = log_to_csv(user_id, session_id, platform, obf_embedding)
+        # Log to database and CSV in parallel
+        db_future, csv_future = _submit_sinks(user_id, session_id, platform, obf_embedding)
+        status['db_success'] = db_future.result()
+        status['csv_success'] = csv_future.result()
         
         # Overall success if at least one logging method succeeded
         status['overall_success'] = status['db_success'] or status['csv_success']
         
         if status['overall_success']:
-            logger.info(f"Embedding logging completed for user {user_id}")
+            logger.info("Embedding logging completed for user %s", user_id)
         else:
-            logger.warning(f"Both logging methods failed for user {user_id}")
+            logger.warning("Both logging methods failed for user %s", user_id)
             
     except Exception as e:
-        logger.error(f"Unexpected error in unified logging for user {user_id}: {e}")
+        logger.error("Unexpected error in unified logging for user %s: %s", user_id, e)
         # Even if we get an unexpected error, we still return the status
         status['overall_success'] = status['db_success'] or status['csv_success']
     
-    return status
\ No newline at end of file
+    return status
+
+
+def log_embeddings_batch(rows: Iterable[Tuple[str, str, str, List[float]]]) -> dict:
+    """
+    Log many embeddings to both database and CSV.
+    
+    Each embedding is validated once; valid rows are written to the database
+    in one transaction and appended to the CSV log under one lock.
+    
+    Args:
+        rows: Iterable of (user_id, session_id, platform, obf_embedding) tuples,
+              in the same order as log_embedding()'s arguments
+        
+    Returns:
+        dict: Counts of rows 'valid', 'db_saved' and 'csv_logged'
+    """
+    valid = [row for row in rows if _validate_embedding(row[3], row[0], row[1], row[2])]
+    status = {'valid': len(valid), 'db_saved': 0, 'csv_logged': 0}
+    if not valid:
+        return status
+    
+    with _validated_scope(*(row[3] for row in valid)):
+        status['db_saved'] = save_embeddings_batch(
+            (user_id, session_id, obf_embedding, platform)
+            for user_id, session_id, platform, obf_embedding in valid
+        )
+    
+    try:
+        timestamp = _now_iso()
+        _write_csv_rows([
+            [timestamp, user_id, session_id, platform, json.dumps(obf_embedding)]
+            for user_id, session_id, platform, obf_embedding in valid
+        ])
+        status['csv_logged'] = len(valid)
+    except Exception as e:
+        logger.error("Failed to log embedding batch to CSV: %s", e)
+    
+    return status
@@ -10,17 +10,28 @@ For production use:
 - Handles edge cases and provides proper error reporting
 """
 
+import array
+import functools
 import hashlib
-import random
 import logging
 import os
-from typing import List, Union
+import threading
+from typing import Dict, List, Optional, Union
 from datetime import datetime
 import uuid
 
+import numpy as np
+
+# Try to import numba, with fallback
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Import required modules
 from keystore import KeyStore
-from embed_logger import log_embedding
+from embed_logger import log_embedding, log_embeddings_batch
 
 # Configure logging with environment variable control
 # Set EMBEDCORE_LOG_LEVEL environment variable to control logging level
@@ -40,12 +51,163 @@ log_level = log_level_map.get(log_level_str, logging.INFO)  # Default to INFO if
 logger = logging.getLogger(__name__)
 logger.setLevel(log_level)
 
+# Number of generated embeddings kept in memory (about 3 KB each)
+_EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDCORE_CACHE_SIZE', '4096'))
+
+# Per-thread work matrix reused by secure_embed_batch; batches larger than
+# _SCRATCH_MAX_ROWS get a fresh allocation instead of growing it
+_SCRATCH = threading.local()
+_SCRATCH_MAX_ROWS = 1024
+
+
+@functools.lru_cache(maxsize=4096)
+def _derive_transform(user_key: str) -> float:
+    """
+    Derive the offset obfuscate() adds for a user key.
+    
+    Memoized per key string, so repeat calls for the same user skip the
+    SHA-256 derivation. Call _derive_transform.cache_clear() after rotating
+    keys to drop offsets for retired keys.
+    """
+    # First 4 digest bytes, read without a hex round trip (same value as hex[:8])
+    seed = int.from_bytes(hashlib.sha256(user_key.encode()).digest()[:4], 'big')
+    return (seed % 1000) / 10000.0 - 0.05  # Value between -0.05 and 0.05
+
+
+def _text_seed(text: str) -> int:
+    """Seed for a text's embedding generator."""
+    return hash(text) % (2**32)
+
+
+# PCG32 (XSH-RR) constants for the compiled generator
+_PCG_MULT = np.uint64(6364136223846793005)
+_PCG_INC = np.uint64(109)  # (54 << 1) | 1, the reference default stream
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True, boundscheck=False)
+    def _fill_embeddings(seeds: np.ndarray, out: np.ndarray) -> None:
+        """
+        Fill each row of out with a unit-length vector drawn from PCG32(seed).
+        
+        The draw, the sum of squares and the scaling run as plain loops with no
+        temporaries; values are uniform in [-1, 1) before normalization.
+        """
+        n, dim = out.shape
+        for r in range(n):
+            # pcg32_srandom: step from zero, add the seed, step again
+            state = _PCG_INC + np.uint64(seeds[r])
+            state = state * _PCG_MULT + _PCG_INC
+            acc = 0.0
+            for i in range(dim):
+                old = state
+                state = old * _PCG_MULT + _PCG_INC
+                xorshifted = (((old >> np.uint64(18)) ^ old) >> np.uint64(27)) & _MASK32
+                rot = old >> np.uint64(59)
+                bits = ((xorshifted >> rot) | (xorshifted << ((np.uint64(32) - rot) & np.uint64(31)))) & _MASK32
+                x = bits * (2.0 / 4294967296.0) - 1.0
+                out[r, i] = x
+                acc += x * x
+            if acc > 0.0:
+                # One reciprocal, then multiplies
+                scale = 1.0 / np.sqrt(acc)
+                for i in range(dim):
+                    out[r, i] *= scale
+            else:
+                # Handle zero vector case
+                for i in range(dim):
+                    out[r, i] = 0.0
+                out[r, 0] = 1.0  # Make it a unit vector
+
+
+def _pcg32_jump_tables(steps: int):
+    """
+    (A, C) with state_i = A[i] * state_0 + C[i] (mod 2**64) after i PCG32 steps.
+    
+    Lets the NumPy fallback compute every state of a row at once instead of
+    stepping the recurrence one element at a time.
+    """
+    mult, inc, mask = int(_PCG_MULT), int(_PCG_INC), (1 << 64) - 1
+    a, c = [1], [0]
+    for _ in range(steps - 1):
+        a.append(a[-1] * mult & mask)
+        c.append((c[-1] * mult + inc) & mask)
+    return np.array(a, dtype=np.uint64), np.array(c, dtype=np.uint64)
+
+
+_PCG_JUMP_MULT, _PCG_JUMP_ADD = _pcg32_jump_tables(384)
+
+
+def _fill_embeddings_numpy(seeds: np.ndarray, out: np.ndarray) -> None:
+    """
+    NumPy version of _fill_embeddings: the same PCG32 stream, so a text embeds
+    to the same vector whether or not numba is installed.
+    
+    All states of all rows come from the jump tables in one uint64 broadcast
+    (arithmetic wraps modulo 2**64, as in the kernel); output and scaling are
+    whole-matrix operations.
+    """
+    # pcg32_srandom: step from zero, add the seed, step again
+    start = (_PCG_INC + seeds) * _PCG_MULT + _PCG_INC
+    old = start[:, None] * _PCG_JUMP_MULT + _PCG_JUMP_ADD
+    xorshifted = (((old >> np.uint64(18)) ^ old) >> np.uint64(27)) & _MASK32
+    rot = old >> np.uint64(59)
+    bits = ((xorshifted >> rot) | (xorshifted << ((np.uint64(32) - rot) & np.uint64(31)))) & _MASK32
+    np.multiply(bits, 2.0 / 4294967296.0, out=out)
+    out -= 1.0
+    
+    # Normalize each row to have unit length
+    magnitude = np.linalg.norm(out, axis=1, keepdims=True)
+    zero_rows = (magnitude == 0).ravel()
+    magnitude[zero_rows] = 1.0
+    # One reciprocal per row, then an in-place multiply over the matrix
+    out *= 1.0 / magnitude
+    if zero_rows.any():
+        # Handle zero vector case
+        out[zero_rows] = 0.0
+        out[zero_rows, 0] = 1.0  # Make it a unit vector
+
+
+def _scratch_matrix(rows: int) -> np.ndarray:
+    """Return a (rows, 384) float64 view of this thread's reusable work matrix."""
+    if rows > _SCRATCH_MAX_ROWS:
+        return np.empty((rows, 384))
+    buf = getattr(_SCRATCH, 'buf', None)
+    if buf is None or buf.shape[0] < rows:
+        buf = _SCRATCH.buf = np.empty((max(rows, 64), 384))
+    return buf[:rows]
+
+
+def _embedding_matrix(seeds: List[int], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Generate the unit-length embeddings for seeds as rows of a float64 matrix.
+    
+    Each row comes from a generator with its own seed, so a text embeds to
+    the same vector whether it is generated alone or in a batch. Uses the
+    compiled PCG32 kernel when numba is installed and the identical NumPy
+    version otherwise.
+    Rows are written into out when given, otherwise into a new matrix.
+    """
+    mat = np.empty((len(seeds), 384)) if out is None else out
+    fill = _fill_embeddings if NUMBA_AVAILABLE else _fill_embeddings_numpy
+    fill(np.asarray(seeds, dtype=np.uint64), mat)
+    return mat
+
+
+@functools.lru_cache(maxsize=_EMBEDDING_CACHE_SIZE)
+def _cached_embedding(seed: int) -> np.ndarray:
+    """Embedding for a seed, memoized as a read-only float64 array."""
+    embedding = _embedding_matrix([seed])[0]
+    embedding.flags.writeable = False
+    return embedding
+
 
 def generate_embedding(message_text: str) -> List[float]:
     """
     Generate a deterministic embedding vector from text.
     
-    This function uses a seeded random generator to produce consistent,
+    This function uses a seeded generator to produce consistent,
     reproducible embeddings for the same input text.
     
     Args:
@@ -62,31 +224,123 @@ def generate_embedding(message_text: str) -> List[float]:
         raise TypeError("message_text must be a string")
         
     try:
-        # Use a fixed seed for deterministic behavior
-        seed = hash(message_text) % (2**32)
-        random.seed(seed)
-        logger.debug(f"Generating embedding with seed: {seed}")
-        
-        # Generate a 384-dimensional vector (standard size)
-        embedding = []
-        for i in range(384):
-            # Create deterministic values based on the seed
-            val = random.uniform(-1.0, 1.0)
-            embedding.append(val)
-        
-        # Normalize the vector to have unit length
-        magnitude = sum(x*x for x in embedding) ** 0.5
-        if magnitude > 0:
-            embedding = [x / magnitude for x in embedding]
-        else:
-            # Handle zero vector case
-            embedding = [0.0] * 384
-            embedding[0] = 1.0  # Make it a unit vector
+        # Repeated texts are served from the cache; callers get their own list
+        embedding = _cached_embedding(_text_seed(message_text)).tolist()
             
-        logger.info(f"Generated embedding for text of length {len(message_text)}")
+        logger.info("Generated embedding for text of length %d", len(message_text))
         return embedding
     except Exception as e:
-        logger.error(f"Error generating embedding: {e}")
+        logger.error("Error generating embedding: %s", e)
+        raise
+
+
+def generate_embedding_array(message_text: str, dtype=np.float32) -> np.ndarray:
+    """
+    Generate the same embedding as generate_embedding() as a compact NumPy array.
+    
+    float32 (the default) takes 1.5 KB per vector and float16 768 bytes, against
+    roughly 12 KB for a list of Python floats; use it for similarity math and
+    storage. Keep generate_embedding() for anything that is later obfuscated,
+    since the 1e-10 round-trip guarantee needs float64.
+    
+    Args:
+        message_text (str): Input text to convert to embedding
+        dtype: NumPy dtype of the result (default: np.float32)
+        
+    Returns:
+        np.ndarray: Embedding vector of length 384. With dtype=np.float64 this is
+                    the shared cached array and is read-only.
+        
+    Raises:
+        TypeError: If message_text is not a string
+    """
+    if not isinstance(message_text, str):
+        raise TypeError("message_text must be a string")
+    return _cached_embedding(_text_seed(message_text)).astype(dtype, copy=False)
+
+
+def generate_embedding_buffer(message_text: str) -> array.array:
+    """
+    Generate the same embedding as generate_embedding() as an array.array('f').
+    
+    For callers that only index or iterate and cannot take an ndarray: the
+    floats live in one contiguous float32 buffer (about 1.5 KB instead of
+    roughly 12 KB for a list), and tobytes() gives exactly the bytes
+    database_prod.pack_vector() stores in vector_blob.
+    
+    Args:
+        message_text (str): Input text to convert to embedding
+        
+    Returns:
+        array.array: Embedding vector of length 384 with typecode 'f'
+        
+    Raises:
+        TypeError: If message_text is not a string
+    """
+    buf = array.array('f')
+    buf.frombytes(generate_embedding_array(message_text, np.float32).tobytes())
+    return buf
+
+
+def _generate_and_obfuscate(message_text: str, transform_val: float) -> np.ndarray:
+    """
+    Embedding for message_text with the key offset already added.
+    
+    Equivalent to obfuscate(generate_embedding(message_text), key) but reads
+    the cached unit vector once and writes the offset result in the same
+    pass, without building the intermediate lists.
+    """
+    return np.add(_cached_embedding(_text_seed(message_text)), transform_val)
+
+
+def _as_vector(values: List[float], name: str) -> np.ndarray:
+    """
+    Convert a list of numbers to a float64 array in one NumPy call.
+    
+    Raises:
+        TypeError: If any element is not numeric
+    """
+    try:
+        arr = np.asarray(values)
+    except (TypeError, ValueError) as e:
+        raise TypeError(f"{name} must be numeric: {e}")
+    if arr.ndim != 1 or arr.dtype.kind not in "biuf":
+        raise TypeError(f"{name} must contain only numeric values, got {arr.dtype}")
+    return arr.astype(np.float64, copy=False)
+
+
+def _apply_key_offset(values: List[float], name: str, user_key: str, sign: int) -> List[float]:
+    """
+    Shared body of obfuscate() (sign=+1) and deobfuscate() (sign=-1).
+    
+    Validates the inputs, then adds sign times the key-derived offset to
+    every element in one pass.
+    """
+    if not isinstance(values, list):
+        raise TypeError(f"{name} must be a list")
+    if not isinstance(user_key, str):
+        raise TypeError("user_key must be a string")
+    if len(values) == 0:
+        raise ValueError(f"{name} cannot be empty")
+    
+    action = "Obfuscat" if sign > 0 else "De-obfuscat"
+    try:
+        # Validate that the vector contains only numeric values
+        arr = _as_vector(values, name)
+        
+        # Derive the transformation from the user key
+        transform_val = _derive_transform(user_key)
+        logger.debug("%sing with offset derived from key: %s", action, transform_val)
+        
+        # Apply (or reverse) the key-derived transformation in one pass. arr was
+        # freshly converted from the caller's list, so it is updated in place.
+        arr += sign * transform_val
+        result = arr.tolist()
+        
+        logger.info("%sed embedding of length %d", action, len(values))
+        return result
+    except Exception as e:
+        logger.error("Error %sing embedding: %s", action.lower(), e)
         raise
 
 
@@ -110,36 +364,7 @@ def obfuscate(embedding: List[float], user_key: str) -> List[float]:
         TypeError: If embedding is not a list of floats or user_key is not a string
         ValueError: If embedding is empty
     """
-    if not isinstance(embedding, list):
-        raise TypeError("embedding must be a list")
-    if not isinstance(user_key, str):
-        raise TypeError("user_key must be a string")
-    if len(embedding) == 0:
-        raise ValueError("embedding cannot be empty")
-        
-    try:
-        # Validate that embedding contains only numeric values
-        for i, val in enumerate(embedding):
-            if not isinstance(val, (int, float)):
-                raise TypeError(f"embedding[{i}] must be numeric, got {type(val)}")
-        
-        # Derive a seed from the user key
-        key_hash = hashlib.sha256(user_key.encode()).hexdigest()
-        seed = int(key_hash[:8], 16) % (2**32)  # Use first 8 chars for seed
-        logger.debug(f"Obfuscating with seed derived from key: {seed}")
-        
-        # Apply transformation based on key
-        obf_embedding = embedding.copy()
-        for i, val in enumerate(obf_embedding):
-            # Apply a key-derived transformation
-            transform_val = (seed % 1000) / 10000.0 - 0.05  # Value between -0.05 and 0.05
-            obf_embedding[i] = val + transform_val
-        
-        logger.info(f"Obfuscated embedding of length {len(embedding)}")
-        return obf_embedding
-    except Exception as e:
-        logger.error(f"Error obfuscating embedding: {e}")
-        raise
+    return _apply_key_offset(embedding, "embedding", user_key, 1)
 
 
 def deobfuscate(obf_embedding: List[float], user_key: str) -> List[float]:
@@ -160,36 +385,7 @@ def deobfuscate(obf_embedding: List[float], user_key: str) -> List[float]:
         TypeError: If obf_embedding is not a list of floats or user_key is not a string
         ValueError: If obf_embedding is empty
     """
-    if not isinstance(obf_embedding, list):
-        raise TypeError("obf_embedding must be a list")
-    if not isinstance(user_key, str):
-        raise TypeError("user_key must be a string")
-    if len(obf_embedding) == 0:
-        raise ValueError("obf_embedding cannot be empty")
-        
-    try:
-        # Validate that obf_embedding contains only numeric values
-        for i, val in enumerate(obf_embedding):
-            if not isinstance(val, (int, float)):
-                raise TypeError(f"obf_embedding[{i}] must be numeric, got {type(val)}")
-        
-        # Derive the same seed from the user key
-        key_hash = hashlib.sha256(user_key.encode()).hexdigest()
-        seed = int(key_hash[:8], 16) % (2**32)  # Use first 8 chars for seed
-        logger.debug(f"De-obfuscating with seed derived from key: {seed}")
-        
-        # Reverse the transformation
-        original_embedding = obf_embedding.copy()
-        for i, val in enumerate(original_embedding):
-            # Reverse the key-derived transformation
-            transform_val = (seed % 1000) / 10000.0 - 0.05  # Same value as in obfuscate
-            original_embedding[i] = val - transform_val
-        
-        logger.info(f"De-obfuscated embedding of length {len(obf_embedding)}")
-        return original_embedding
-    except Exception as e:
-        logger.error(f"Error de-obfuscating embedding: {e}")
-        raise
+    return _apply_key_offset(obf_embedding, "obf_embedding", user_key, -1)
 
 
 def secure_embed(message: str, user_id: str, platform: str) -> dict:
@@ -234,7 +430,7 @@ def secure_embed(message: str, user_id: str, platform: str) -> dict:
         raise ValueError("platform cannot be empty")
         
     try:
-        logger.info(f"Processing secure embedding for user {user_id} on platform {platform}")
+        logger.info("Processing secure embedding for user %s on platform %s", user_id, platform)
         
         # Fetch the user key using get_key(user_id), and if missing, generate it using generate_key(user_id)
         keystore = KeyStore()
@@ -242,20 +438,16 @@ def secure_embed(message: str, user_id: str, platform: str) -> dict:
         
         # If no key exists, generate one
         if user_key_bytes is None:
-            logger.info(f"No existing key found for user {user_id}, generating new key")
+            logger.info("No existing key found for user %s, generating new key", user_id)
             user_key_bytes = keystore.generate_key(user_id)
         
         # Decode key for use in obfuscation
         user_key = user_key_bytes.decode()
         logger.debug("Retrieved user key for obfuscation")
         
-        # Generate the embedding using generate_embedding(message)
-        embedding = generate_embedding(message)
-        logger.debug(f"Generated embedding with {len(embedding)} dimensions")
-        
-        # Obfuscate it using obfuscate(embedding, key)
-        obf_embedding = obfuscate(embedding, user_key)
-        logger.debug("Obfuscated embedding with user key")
+        # Generate the embedding and obfuscate it with the key in one pass
+        obf_embedding = _generate_and_obfuscate(message, _derive_transform(user_key)).tolist()
+        logger.debug("Generated and obfuscated embedding with %d dimensions", len(obf_embedding))
         
         # Create an ISO timestamp using datetime.utcnow().isoformat()
         timestamp = datetime.utcnow().isoformat()
@@ -266,9 +458,9 @@ def secure_embed(message: str, user_id: str, platform: str) -> dict:
         # Log the embedding by calling log_embedding() from embed_logger with user_id, session_id, platform, obfuscated embedding
         log_result = log_embedding(user_id, session_id, platform, obf_embedding)
         if log_result['overall_success']:
-            logger.info(f"Successfully logged embedding for user {user_id}")
+            logger.info("Successfully logged embedding for user %s", user_id)
         else:
-            logger.warning(f"Failed to log embedding for user {user_id}")
+            logger.warning("Failed to log embedding for user %s", user_id)
         
         # Return a JSON dictionary exactly in this format
         result = {
@@ -278,11 +470,93 @@ def secure_embed(message: str, user_id: str, platform: str) -> dict:
             "timestamp": timestamp
         }
         
-        logger.info(f"Secure embedding processing completed for user {user_id}")
+        logger.info("Secure embedding processing completed for user %s", user_id)
         return result
         
     except Exception as e:
-        logger.error(f"Error in secure_embed for user {user_id}: {e}")
+        logger.error("Error in secure_embed for user %s: %s", user_id, e)
+        raise
+
+
+def secure_embed_batch(messages: List[str], user_ids: List[str], platforms: List[str]) -> List[dict]:
+    """
+    Run secure_embed() over many messages at once.
+    
+    Embeddings are generated and obfuscated as one matrix, each distinct user's
+    key is fetched once, and all rows are logged in a single batch.
+    
+    Args:
+        messages (List[str]): Text messages to process
+        user_ids (List[str]): User identifier for each message
+        platforms (List[str]): Platform identifier for each message
+        
+    Returns:
+        List[dict]: One secure_embed()-style result per message, in order
+        
+    Raises:
+        TypeError: If inputs are not of expected types
+        ValueError: If the lists differ in length or required fields are empty
+        Exception: For any other processing errors
+    """
+    if not (len(messages) == len(user_ids) == len(platforms)):
+        raise ValueError("messages, user_ids and platforms must have the same length")
+    for message, user_id, platform in zip(messages, user_ids, platforms):
+        if not isinstance(message, str):
+            raise TypeError("message must be a string")
+        if not isinstance(user_id, str):
+            raise TypeError("user_id must be a string")
+        if not isinstance(platform, str):
+            raise TypeError("platform must be a string")
+        if not user_id:
+            raise ValueError("user_id cannot be empty")
+        if not platform:
+            raise ValueError("platform cannot be empty")
+    if not messages:
+        return []
+        
+    try:
+        logger.info("Processing %d secure embeddings", len(messages))
+        
+        # Fetch (or generate) each distinct user's key once
+        keystore = KeyStore()
+        user_keys: Dict[str, str] = {}
+        for user_id in dict.fromkeys(user_ids):
+            user_key_bytes = keystore.get_key(user_id)
+            if user_key_bytes is None:
+                logger.info("No existing key found for user %s, generating new key", user_id)
+                user_key_bytes = keystore.generate_key(user_id)
+            user_keys[user_id] = user_key_bytes.decode()
+        
+        # Generate all embeddings and apply each row's key-derived offset
+        offsets = np.array([_derive_transform(user_keys[user_id]) for user_id in user_ids])
+        # Rows are converted to lists below, so the thread's scratch matrix can hold them
+        seeds = [_text_seed(message) for message in messages]
+        obf_matrix = _embedding_matrix(seeds, out=_scratch_matrix(len(seeds)))
+        obf_matrix += offsets[:, np.newaxis]
+        
+        timestamp = datetime.utcnow().isoformat()
+        results = []
+        log_rows = []
+        for user_id, platform, obf_row in zip(user_ids, platforms, obf_matrix):
+            obf_embedding = obf_row.tolist()
+            log_rows.append((user_id, str(uuid.uuid4()), platform, obf_embedding))
+            results.append({
+                "embedding": obf_embedding,
+                "user_id": user_id,
+                "platform": platform,
+                "timestamp": timestamp
+            })
+        
+        log_result = log_embeddings_batch(log_rows)
+        if log_result['db_saved'] < len(log_rows) or log_result['csv_logged'] < len(log_rows):
+            logger.warning("Logged %d to database and %d to CSV out of %d embeddings",
+                           log_result['db_saved'], log_result['csv_logged'], len(log_rows))
+        
+        logger.info("Secure embedding batch completed for %d messages", len(results))
+        return results
+        
+    except Exception as e:
+        logger.error("Error in secure_embed_batch: %s", e)
         raise
 
 
@@ -0,0 +1,95 @@
+"""
+EmbedCore v3 - Compiled Obfuscation Kernels
+
+Drop-in replacements for embedcore_v3.obfuscate and embedcore_v3.deobfuscate
+that apply the key-derived offset in a single compiled loop.
+
+The transformation is identical to the reference implementation, so vectors
+obfuscated by either module can be restored by the other. Numba is optional:
+when it is not installed the same kernel runs as a NumPy broadcast.
+"""
+
+import logging
+from typing import List
+
+import numpy as np
+
+# Key derivation and input conversion are shared with the reference module,
+# so both use the same memoized per-key offsets
+from embedcore_v3 import _as_vector, _derive_transform
+
+# Try to import numba, with fallback
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _apply_offset(values: np.ndarray, offset: float) -> np.ndarray:
+        """Add a scalar offset to every element of a float64 vector, in place."""
+        for i in range(values.shape[0]):
+            values[i] += offset
+        return values
+else:
+    def _apply_offset(values: np.ndarray, offset: float) -> np.ndarray:
+        """Add a scalar offset to every element of a float64 vector, in place."""
+        values += offset
+        return values
+
+
+def obfuscate(embedding: List[float], user_key: str) -> List[float]:
+    """
+    Obfuscate an embedding using a user key.
+
+    Args:
+        embedding (List[float]): Original embedding vector to obfuscate
+        user_key (str): User-specific key for obfuscation
+
+    Returns:
+        List[float]: Obfuscated embedding vector
+
+    Raises:
+        TypeError: If embedding is not a list of numbers or user_key is not a string
+        ValueError: If embedding is empty
+    """
+    if not isinstance(embedding, list):
+        raise TypeError("embedding must be a list")
+    if not isinstance(user_key, str):
+        raise TypeError("user_key must be a string")
+    if len(embedding) == 0:
+        raise ValueError("embedding cannot be empty")
+
+    values = _as_vector(embedding, "embedding")
+    return _apply_offset(values, _derive_transform(user_key)).tolist()
+
+
+def deobfuscate(obf_embedding: List[float], user_key: str) -> List[float]:
+    """
+    De-obfuscate an embedding using a user key.
+
+    Args:
+        obf_embedding (List[float]): Obfuscated embedding vector to restore
+        user_key (str): User-specific key used for original obfuscation
+
+    Returns:
+        List[float]: Original embedding vector
+
+    Raises:
+        TypeError: If obf_embedding is not a list of numbers or user_key is not a string
+        ValueError: If obf_embedding is empty
+    """
+    if not isinstance(obf_embedding, list):
+        raise TypeError("obf_embedding must be a list")
+    if not isinstance(user_key, str):
+        raise TypeError("user_key must be a string")
+    if len(obf_embedding) == 0:
+        raise ValueError("obf_embedding cannot be empty")
+
+    values = _as_vector(obf_embedding, "obf_embedding")
+    return _apply_offset(values, -_derive_transform(user_key)).tolist()
@@ -6,9 +6,48 @@ This script checks the quality of embeddings in the database to ensure they are
 """
 
 import sqlite3
-import json
+from typing import Tuple
+
 import numpy as np
 
+from database_prod import VECTOR_DTYPE
+
+# Try to use orjson for faster float-array parsing, with fallback
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+def _decode_vector(value) -> np.ndarray:
+    """Decode a vector_blob value from either raw float32 bytes or legacy JSON text."""
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=VECTOR_DTYPE)
+    return np.asarray(json_loads(value), dtype=VECTOR_DTYPE)
+
+def _chunk_nonzero_counts(blobs: list) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Non-zero count and length of each stored vector in a chunk of rows.
+    
+    When every blob is raw bytes of the same length, the chunk is viewed as one
+    (N, dim) matrix and counted in a single pass. Rows that fail to decode get
+    a length of -1.
+    """
+    if blobs and all(isinstance(b, bytes) for b in blobs) and len({len(b) for b in blobs}) == 1:
+        mat = np.frombuffer(b"".join(blobs), dtype=VECTOR_DTYPE).reshape(len(blobs), -1)
+        return np.count_nonzero(mat, axis=1), np.full(len(blobs), mat.shape[1])
+    
+    nnz = np.zeros(len(blobs), dtype=np.int64)
+    sizes = np.full(len(blobs), -1)
+    for i, blob in enumerate(blobs):
+        try:
+            embedding = _decode_vector(blob)
+        except Exception:
+            continue
+        nnz[i] = np.count_nonzero(embedding)
+        sizes[i] = embedding.size
+    return nnz, sizes
+
+
 def check_embedding_quality(db_path: str = "assistant_core.db"):
     """Check the quality of embeddings in the database."""
     print("Checking embedding quality...")
@@ -16,46 +55,51 @@ def check_embedding_quality(db_path: str = "assistant_core.db"):
     # Connect to the database
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
+    cursor.arraysize = 1024
     
-    # Get all embeddings
-    cursor.execute("SELECT item_type, item_id, vector_blob FROM embeddings")
-    results = cursor.fetchall()
+    # Count first so rows can be streamed instead of fetched all at once
+    total_embeddings = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
     
-    if not results:
+    if not total_embeddings:
         print("No embeddings found in database.")
+        conn.close()
         return
     
-    print(f"Found {len(results)} embeddings to check:")
+    print(f"Found {total_embeddings} embeddings to check:")
     
-    total_embeddings = len(results)
     good_embeddings = 0
     zero_embeddings = 0
     sparse_embeddings = 0
     
-    for item_type, item_id, vector_blob in results:
-        try:
-            # Parse the embedding
-            embedding = json.loads(vector_blob)
-            
-            # Count non-zero values
-            non_zero_count = sum(1 for val in embedding if val != 0.0)
-            zero_percentage = (1 - non_zero_count / len(embedding)) * 100
-            
-            # Classify embedding quality
-            if non_zero_count == len(embedding):
-                good_embeddings += 1
-                quality = "GOOD"
-            elif zero_percentage > 90:
-                zero_embeddings += 1
-                quality = "MOSTLY_ZERO"
-            else:
-                sparse_embeddings += 1
-                quality = "SPARSE"
-            
-            print(f"- {item_type} {item_id}: {quality} ({zero_percentage:.1f}% zero)")
-            
-        except Exception as e:
-            print(f"- {item_type} {item_id}: ERROR - {e}")
+    # Stream rows in chunks; each chunk is classified as one matrix and only
+    # the running counters are kept
+    cursor.execute("SELECT item_type, item_id, vector_blob FROM embeddings")
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        
+        nnz, sizes = _chunk_nonzero_counts([row[2] for row in rows])
+        valid = sizes > 0
+        zero_pct = np.where(valid, (1 - nnz / np.where(valid, sizes, 1)) * 100, 0.0)
+        good = valid & (nnz == sizes)
+        mostly_zero = valid & ~good & (zero_pct > 90)
+        good_embeddings += int(good.sum())
+        zero_embeddings += int(mostly_zero.sum())
+        sparse_embeddings += int((valid & ~good & ~mostly_zero).sum())
+        
+        for (item_type, item_id, vector_blob), ok, is_good, is_zero, pct in zip(
+                rows, valid, good, mostly_zero, zero_pct):
+            if not ok:
+                try:
+                    _decode_vector(vector_blob)
+                    error = "empty embedding"
+                except Exception as e:
+                    error = e
+                print(f"- {item_type} {item_id}: ERROR - {error}")
+                continue
+            quality = "GOOD" if is_good else "MOSTLY_ZERO" if is_zero else "SPARSE"
+            print(f"- {item_type} {item_id}: {quality} ({pct:.1f}% zero)")
     
     conn.close()
     
@@ -1,15 +1,16 @@
+import functools
+import hashlib
+import os
 import sqlite3
-import json
 import numpy as np
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 import time
 import asyncio
 
 # Import production components
-from database_prod import db_manager
-from cache import cache_manager, cached
+from database_prod import db_manager, pack_vector, unpack_vector
 from vector_db import vector_db
 from config import config
 from circuit_breaker import CircuitBreakerOpenException
@@ -22,10 +23,202 @@ except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
     print("Warning: sentence-transformers not available. Using fallback embedding method.")
 
+# Try to import the ONNX Runtime backend (optimum), with fallback
+try:
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Try to import usearch (SIMD exact search), with fallback
+try:
+    from usearch.index import MetricKind, search as usearch_search
+    USEARCH_AVAILABLE = True
+except ImportError:
+    USEARCH_AVAILABLE = False
+
+# Try to import numba, with fallback
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Character trigrams scanned per text, and the weight each adds
+_TRIGRAM_LIMIT = 200
+_TRIGRAM_WEIGHT = 0.05
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _trigram_scatter(buf: np.ndarray, vec: np.ndarray) -> None:
+        """Add _TRIGRAM_WEIGHT to vec at a polynomial hash of each byte trigram of buf."""
+        for i in range(min(buf.shape[0] - 2, _TRIGRAM_LIMIT)):
+            h = (buf[i] * 961 + buf[i + 1] * 31 + buf[i + 2]) & 0x7FFFFFFF
+            vec[h % vec.shape[0]] += _TRIGRAM_WEIGHT
+else:
+    def _trigram_scatter(buf: np.ndarray, vec: np.ndarray) -> None:
+        """Add _TRIGRAM_WEIGHT to vec at a polynomial hash of each byte trigram of buf."""
+        buf = buf[:_TRIGRAM_LIMIT + 2].astype(np.int64)
+        h = (buf[:-2] * 961 + buf[1:-1] * 31 + buf[2:]) & 0x7FFFFFFF
+        vec += _TRIGRAM_WEIGHT * np.bincount(h % vec.shape[0], minlength=vec.shape[0])
+
+def _hash_embedding(text: str) -> np.ndarray:
+    """
+    Hash-based 384-dimensional embedding used when no model is available.
+
+    Words and word positions are hashed to slots with the built-in
+    (per-process) hash and accumulated with one np.bincount; character
+    trigrams are scattered by _trigram_scatter over the UTF-8 bytes, without
+    building trigram strings. The result is normalized with np.linalg.norm.
+    """
+    text_lower = text.lower()
+    words = text_lower.split()[:100]  # Limit to first 100 words
+
+    # Multiple hash functions per word to distribute values better
+    slots = [hash(word) for word in words]
+    slots += [hash(word + "salt1") for word in words]
+    slots += [hash(word + "salt2") for word in words]
+    # Positional information: the first 50 words, with decreasing weight
+    positional = words[:50]
+    slots += [hash(f"pos_{i}_{word}") for i, word in enumerate(positional)]
+
+    n = len(words)
+    weights = np.concatenate((
+        np.full(n, 1.0), np.full(n, 0.5), np.full(n, 0.25),
+        0.1 * (1.0 - np.arange(len(positional)) / 50.0),
+    ))
+    vec = np.bincount(np.asarray(slots, dtype=np.int64) % 384, weights=weights, minlength=384)
+    # Character-level n-grams
+    _trigram_scatter(np.frombuffer(text_lower.encode("utf-8"), dtype=np.uint8), vec)
+
+    # L2 normalize
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        # If all values are zero, create a small random vector
+        vec = np.random.random(384)
+        norm = np.linalg.norm(vec)
+    vec /= norm
+    return vec
+
+
+def _top_k_rows(matrix: np.ndarray, query: np.ndarray, k: int, excluded: Optional[int] = None) -> List[Tuple[int, float]]:
+    """
+    Return up to k (row, cosine) pairs of matrix nearest to query, best first.
+
+    matrix rows and query are unit vectors; row excluded is never returned.
+    With usearch installed the exact scan runs in its runtime-dispatched SIMD
+    kernels, otherwise as one NumPy matrix-vector product and argpartition.
+    """
+    k = min(k, matrix.shape[0] - (excluded is not None))
+    if k <= 0:
+        return []
+
+    if USEARCH_AVAILABLE:
+        # One extra match covers the excluded row
+        matches = usearch_search(matrix, query, k + (excluded is not None), MetricKind.Cos, exact=True)
+        rows = [(int(row), 1.0 - float(distance)) for row, distance in zip(matches.keys, matches.distances)
+                if row != excluded]
+        return rows[:k]
+
+    # Rows and query are unit length: one matrix-vector product gives every cosine
+    scores = matrix @ query
+    if excluded is not None:
+        scores[excluded] = -np.inf
+    # Select top k in O(N) with argpartition, then order just those
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return [(int(row), float(scores[row])) for row in top]
+
+
+def _unit_vector(vector: np.ndarray) -> np.ndarray:
+    """Return vector as a new L2-normalized float32 array (a zero vector stays zero)."""
+    unit = np.array(vector, dtype=np.float32)
+    norm = np.linalg.norm(unit)
+    if norm > 0:
+        unit /= norm
+    return unit
+
+
+def _encode_with_model(service: "EmbeddingService", text: str) -> np.ndarray:
+    """Embed text with the service's model, reusing an output persisted by an earlier run."""
+    try:
+        content_hash = service._content_hash(text)
+        persisted = service._load_persisted_embedding(content_hash)
+        if persisted is not None:
+            return persisted
+        # Type ignore for the possibly unbound variable warning
+        embedding = service.model.encode([text])[0]  # type: ignore
+        service._persist_embedding(content_hash, embedding)
+        return embedding
+    except Exception as e:
+        logger.error(f"Error generating embedding: {e}")
+        # Fallback to random vector for testing
+        return np.random.random(384)
+
+
+def _encode_fallback(service: "EmbeddingService", text: str) -> np.ndarray:
+    """Embed text with the hash-based fallback when no model backend is installed."""
+    logger.warning("Using fallback embedding method due to missing sentence-transformers")
+    return _hash_embedding(text)
+
+
+class OnnxSentenceEncoder:
+    """
+    int8-quantized ONNX Runtime encoder exposing the SentenceTransformer.encode() subset used here.
+
+    The model is exported and dynamically quantized on first use and cached
+    under MODEL_CACHE_DIR; pooling (attention-masked mean) and L2
+    normalization run in NumPy.
+    """
+
+    _QUANTIZED_FILE = "model_quantized.onnx"
+
+    def __init__(self, model_name: str, cache_dir: str):
+        model_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        save_dir = os.path.join(cache_dir, "onnx-int8", model_id.replace("/", "__"))
+
+        if not os.path.exists(os.path.join(save_dir, self._QUANTIZED_FILE)):
+            logger.info(f"Exporting and quantizing {model_id} to int8 ONNX in {save_dir}")
+            exported = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True, cache_dir=cache_dir)
+            ORTQuantizer.from_pretrained(exported).quantize(
+                save_dir=save_dir,
+                quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            )
+            AutoTokenizer.from_pretrained(model_id, cache_dir=cache_dir).save_pretrained(save_dir)
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            save_dir, file_name=self._QUANTIZED_FILE,
+            provider="CPUExecutionProvider", session_options=options
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(save_dir)
+
+    def encode(self, sentences: List[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = True) -> np.ndarray:
+        """Embed sentences into an (n, d) float32 array."""
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(
+                sentences[start:start + batch_size], padding=True, truncation=True, return_tensors="np"
+            )
+            hidden = np.asarray(self.model(**inputs).last_hidden_state, dtype=np.float32)
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if normalize_embeddings:
+                pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            batches.append(pooled)
+        return np.concatenate(batches) if batches else np.empty((0, 0), dtype=np.float32)
+
+
 class EmbeddingService:
     """Service for handling embeddings and similarity search - Chandresh's core work."""
     
@@ -33,20 +226,34 @@ class EmbeddingService:
         self.db_path = db_path
         # Use config model name if not provided
         self.model_name = model_name or config.MODEL_NAME
+        # The int8 ONNX backend needs optimum; otherwise sentence-transformers is used
+        self.use_onnx = config.MODEL_BACKEND == "onnx-int8" and ONNX_AVAILABLE
+        if config.MODEL_BACKEND == "onnx-int8" and not ONNX_AVAILABLE:
+            logger.warning("MODEL_BACKEND=onnx-int8 but optimum/onnxruntime are not installed; using sentence-transformers")
         self._model = None
+        # Chosen once here rather than checked on every embedding
+        self._encode_impl = _encode_with_model if self.use_onnx or SENTENCE_TRANSFORMERS_AVAILABLE else _encode_fallback
         # Initialize production components
         db_manager.initialize()
         # Retry configuration
         self.max_retries = 3
         self.retry_delay = 1.0
+        # (signature, (items, matrix, positions)) for the brute-force search fallback
+        self._search_cache = None
+        # Bounded in-process cache of recent embeddings; model outputs are also
+        # persisted in embedding_cache for reuse across processes
+        self._generate_array = functools.lru_cache(maxsize=config.EMBEDDING_CACHE_SIZE)(self._compute_array)
     
     @property
     def model(self):
-        """Lazy load the sentence transformer model."""
-        if not SENTENCE_TRANSFORMERS_AVAILABLE:
-            return None
-            
-        if self._model is None:
+        """Lazy load the embedding model (int8 ONNX encoder or sentence transformer)."""
+        if self._model is not None:
+            return self._model
+        
+        if self.use_onnx:
+            logger.info(f"Loading int8 ONNX model: {self.model_name}")
+            self._model = OnnxSentenceEncoder(self.model_name, config.MODEL_CACHE_DIR)
+        elif SENTENCE_TRANSFORMERS_AVAILABLE:
             logger.info(f"Loading SentenceTransformer model: {self.model_name}")
             # Use cache directory from config
             self._model = SentenceTransformer(  # type: ignore
@@ -80,90 +287,196 @@ class EmbeddingService:
         else:
             raise Exception("All retry attempts failed")
     
-    @cached(ttl=3600)  # Cache for 1 hour
+    async def _retry_with_backoff_async(self, func, *args, **kwargs):
+        """Async _retry_with_backoff: awaits coroutine func and sleeps without blocking the loop."""
+        last_exception = None
+        for attempt in range(self.max_retries):
+            try:
+                return await func(*args, **kwargs)
+            except CircuitBreakerOpenException:
+                # Don't retry if circuit breaker is open
+                raise
+            except Exception as e:
+                last_exception = e
+                logger.warning(f"Attempt {attempt + 1} failed: {e}")
+                if attempt < self.max_retries - 1:
+                    # Exponential backoff
+                    delay = self.retry_delay * (2 ** attempt)
+                    logger.info(f"Retrying in {delay} seconds...")
+                    await asyncio.sleep(delay)
+                continue
+        
+        # If all retries failed, raise the last exception
+        if last_exception:
+            raise last_exception
+        else:
+            raise Exception("All retry attempts failed")
+    
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding vector for given text."""
-        def _generate():
+        return self._generate_array(text).tolist()
+
+    def _compute_array(self, text: str) -> np.ndarray:
+        """
+        Generate the embedding for text as a read-only NumPy array.
+
+        Called through self._generate_array, a per-instance LRU in front of
+        this method. Internal callers keep the array end to end and only
+        serialize it at the storage boundary; the cached array is shared,
+        hence read-only.
+        """
+        embedding = self._retry_with_backoff(self._encode_impl, self, text)
+        embedding.flags.writeable = False
+        return embedding
+
+    def _content_hash(self, text: str) -> bytes:
+        """SHA-256 key for a text under the current model."""
+        # Quantized outputs differ slightly, so they are cached under their own key
+        model_key = f"{self.model_name}#onnx-int8" if self.use_onnx else self.model_name
+        return hashlib.sha256(f"{model_key}\0{text}".encode("utf-8")).digest()
+
+    def _load_persisted_embedding(self, content_hash: bytes) -> Optional[np.ndarray]:
+        """Return the embedding stored in embedding_cache for content_hash, if any."""
+        try:
+            rows = db_manager.execute_query(
+                "SELECT vector_blob FROM embedding_cache WHERE content_hash = :content_hash",
+                {"content_hash": content_hash}
+            )
+        except Exception as e:
+            logger.warning("Embedding cache lookup failed: %s", e)
+            return None
+        return unpack_vector(rows[0][0]) if rows else None
+
+    def _persist_embedding(self, content_hash: bytes, embedding: np.ndarray) -> None:
+        """Store a model output in embedding_cache; failures only cost a recompute later."""
+        try:
+            db_manager.execute_update(
+                '''
+                INSERT OR IGNORE INTO embedding_cache (content_hash, vector_blob, created_at)
+                VALUES (:content_hash, :vector_blob, :created_at)
+                ''',
+                {
+                    "content_hash": content_hash,
+                    "vector_blob": pack_vector(embedding),
+                    "created_at": datetime.now().isoformat()
+                }
+            )
+        except Exception as e:
+            logger.warning("Embedding cache write failed: %s", e)
+
+    def generate_batch(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        """Generate embedding vectors for many texts with batched model calls."""
+        if not texts:
+            return []
+
+        if self.model is None:
+            # The fallback method has no batched form, so embed one at a time
+            return [self.generate_embedding(text) for text in texts]
+
+        def _generate_batch():
+            embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)  # type: ignore
+            return embeddings.tolist()
+
+        return self._retry_with_backoff(_generate_batch)
+
+    def encode_many(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed many texts into an (n, d) float32 matrix of unit vectors, in input order.
+
+        Texts are sorted by length before batching so each model batch pads
+        to a similar length, then the rows are put back in the caller's order.
+        """
+        if not texts:
+            return np.empty((0, 384), dtype=np.float32)
+
+        if self.model is None:
+            # The fallback method has no batched form, so embed one at a time
+            return np.stack([_unit_vector(self._generate_array(text)) for text in texts])
+
+        def _encode():
+            order = np.argsort([len(text) for text in texts], kind='stable')
+            batch_size = config.EMBEDDING_BATCH_SIZE
+            matrix = None
+            for start in range(0, len(texts), batch_size):
+                rows = order[start:start + batch_size]
+                encoded = self.model.encode(  # type: ignore
+                    [texts[i] for i in rows], batch_size=batch_size,
+                    convert_to_numpy=True, normalize_embeddings=True
+                )
+                if matrix is None:
+                    matrix = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+                matrix[rows] = encoded
+            return matrix
+
+        return self._retry_with_backoff(_encode)
+
+    def store_embeddings_bulk(self, items: List[Tuple[str, str, str]]) -> int:
+        """
+        Store embeddings for many (item_type, item_id, text) items at once.
+
+        All texts are encoded with encode_many() and written with one
+        bulk_ingest_embeddings() transaction and one vector_db batch upsert.
+
+        Returns:
+            Number of embeddings stored (0 on failure)
+        """
+        if not items:
+            return 0
+
+        def _store_bulk():
             try:
-                # Use sentence-transformers if available
-                if SENTENCE_TRANSFORMERS_AVAILABLE and self.model:
-                    # Type ignore for the possibly unbound variable warning
-                    embedding = self.model.encode([text])[0]  # type: ignore
-                    return embedding.tolist()
-                else:
-                    # Fallback to improved hash-based embedding
-                    logger.warning("Using fallback embedding method due to missing sentence-transformers")
-                    vec = [0.0] * 384  # Standard size for sentence transformers
-                    
-                    # Split text into words and process each word
-                    words = text.lower().split()
-                    for i, word in enumerate(words[:100]):  # Limit to first 100 words
-                        # Use multiple hash functions to distribute values better
-                        h1 = hash(word) % 384
-                        h2 = hash(word + "salt1") % 384
-                        h3 = hash(word + "salt2") % 384
-                        
-                        # Add values to multiple positions
-                        vec[h1] += 1.0
-                        vec[h2] += 0.5
-                        vec[h3] += 0.25
-                    
-                    # Also add positional information
-                    for i, word in enumerate(words[:50]):  # First 50 words get positional weight
-                        pos_hash = hash(f"pos_{i}_{word}") % 384
-                        vec[pos_hash] += 0.1 * (1.0 - i/50.0)  # Decreasing weight with position
-                    
-                    # Add character-level n-grams for better representation
-                    text_lower = text.lower()
-                    for i in range(len(text_lower) - 2):
-                        if i < 200:  # Limit character n-grams
-                            trigram = text_lower[i:i+3]
-                            char_hash = hash(trigram) % 384
-                            vec[char_hash] += 0.05
-                    
-                    # L2 normalize
-                    norm = sum(v * v for v in vec) ** 0.5
-                    if norm > 0:
-                        vec = [v / norm for v in vec]
-                    else:
-                        # If all values are zero, create a small random vector
-                        vec = np.random.random(384).tolist()
-                        # Normalize the random vector
-                        norm = sum(v * v for v in vec) ** 0.5
-                        vec = [v / norm for v in vec]
-                    return vec
+                matrix = self.encode_many([text or "" for _, _, text in items])
+                timestamp = datetime.now().isoformat()
+                
+                stored = db_manager.bulk_ingest_embeddings(
+                    (item_type, item_id, pack_vector(vector), timestamp, text)
+                    for (item_type, item_id, text), vector in zip(items, matrix)
+                )
+                
+                # Also store in vector database for scalable search
+                if vector_db.enabled:
+                    vector_db.upsert_batch([
+                        (f"{item_type}_{item_id}", vector.tolist(), {
+                            "item_type": item_type,
+                            "item_id": item_id,
+                            "text_content": (text or "")[:1000],  # Limit metadata size
+                            "timestamp": timestamp
+                        })
+                        for (item_type, item_id, text), vector in zip(items, matrix)
+                    ])
+                
+                self._search_cache = None
+                logger.info(f"Stored {stored} embeddings in bulk")
+                return stored
+                
+            except CircuitBreakerOpenException:
+                logger.error("Circuit breaker is open, cannot store embeddings")
+                raise
             except Exception as e:
-                logger.error(f"Error generating embedding: {e}")
-                # Fallback to random vector for testing
-                return np.random.random(384).tolist()
+                logger.error(f"Error storing embeddings in bulk: {e}")
+                raise
         
-        return self._retry_with_backoff(_generate)
-    
+        try:
+            return self._retry_with_backoff(_store_bulk)
+        except CircuitBreakerOpenException:
+            return 0
+        except Exception:
+            return 0
+
     def store_embedding(self, item_type: str, item_id: str, text: str) -> bool:
         """Store embedding for an item in the database."""
         def _store():
             try:
                 # Generate embedding
-                embedding = self.generate_embedding(text)
-                vector_blob = json.dumps(embedding)
+                embedding = self._generate_array(text)
+                # Stored vectors are unit length, so search scores are plain dot products
+                embedding = _unit_vector(embedding)
+                vector_blob = pack_vector(embedding)
+                # One timestamp for both stores
+                timestamp = datetime.now().isoformat()
                 
-                # Store in relational database using named parameters
-                params = {
-                    "item_type": item_type,
-                    "item_id": item_id,
-                    "vector_blob": vector_blob,
-                    "timestamp": datetime.now().isoformat(),
-                    "text_content": text
-                }
-                
-                db_manager.execute_update(
-                    '''
-                    INSERT OR REPLACE INTO embeddings 
-                    (item_type, item_id, vector_blob, timestamp, text_content)
-                    VALUES (:item_type, :item_id, :vector_blob, :timestamp, :text_content)
-                    ''', 
-                    params
-                )
+                # Store in relational database (and the sqlite-vec index, when enabled)
+                db_manager.upsert_embedding(item_type, item_id, vector_blob, timestamp, text)
                 
                 # Also store in vector database for scalable search
                 if vector_db.enabled:
@@ -171,10 +484,11 @@ class EmbeddingService:
                         "item_type": item_type,
                         "item_id": item_id,
                         "text_content": text[:1000],  # Limit metadata size
-                        "timestamp": datetime.now().isoformat()
+                        "timestamp": timestamp
                     }
-                    vector_db.upsert_embedding(f"{item_type}_{item_id}", embedding, metadata)
+                    vector_db.upsert_embedding(f"{item_type}_{item_id}", embedding.tolist(), metadata)
                 
+                self._search_cache = None
                 logger.info(f"Stored embedding for {item_type} {item_id}")
                 return True
                 
@@ -192,6 +506,64 @@ class EmbeddingService:
         except Exception:
             return False
     
+    async def store_embedding_async(self, item_type: str, item_id: str, text: str) -> bool:
+        """
+        Async store_embedding: the model call and both writes run in worker threads.
+
+        The SQLite upsert and the vector_db upsert are awaited together, so
+        their latencies overlap, and retries back off with asyncio.sleep.
+        """
+        async def _store():
+            try:
+                # Generate embedding off the event loop
+                embedding = await asyncio.to_thread(self._generate_array, text)
+                embedding = _unit_vector(embedding)
+                timestamp = datetime.now().isoformat()
+                
+                writes = [asyncio.to_thread(
+                    db_manager.upsert_embedding, item_type, item_id, pack_vector(embedding), timestamp, text
+                )]
+                if vector_db.enabled:
+                    metadata = {
+                        "item_type": item_type,
+                        "item_id": item_id,
+                        "text_content": text[:1000],  # Limit metadata size
+                        "timestamp": timestamp
+                    }
+                    writes.append(asyncio.to_thread(
+                        vector_db.upsert_embedding, f"{item_type}_{item_id}", embedding.tolist(), metadata
+                    ))
+                await asyncio.gather(*writes)
+                
+                self._search_cache = None
+                logger.info(f"Stored embedding for {item_type} {item_id}")
+                return True
+                
+            except CircuitBreakerOpenException:
+                logger.error("Circuit breaker is open, cannot store embedding")
+                raise
+            except Exception as e:
+                logger.error(f"Error storing embedding: {e}")
+                raise
+        
+        try:
+            return await self._retry_with_backoff_async(_store)
+        except CircuitBreakerOpenException:
+            return False
+        except Exception:
+            return False
+    
+    async def store_embeddings_async(self, items: List[Tuple[str, str, str]], concurrency: int = 10) -> int:
+        """Run store_embedding_async over (item_type, item_id, text) items, at most concurrency at a time."""
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def _bounded(item_type: str, item_id: str, text: str) -> bool:
+            async with semaphore:
+                return await self.store_embedding_async(item_type, item_id, text or "")
+        
+        results = await asyncio.gather(*(_bounded(*item) for item in items))
+        return sum(results)
+    
     def cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors."""
         try:
@@ -218,7 +590,7 @@ class EmbeddingService:
             try:
                 # Determine query embedding
                 if query_text:
-                    query_embedding = self.generate_embedding(query_text)
+                    query_embedding = self._generate_array(query_text)
                 elif summary_id:
                     # Get the summary text for the given summary_id
                     results = db_manager.execute_query_all(
@@ -229,10 +601,13 @@ class EmbeddingService:
                     if not results or not results[0] or not results[0][0]:
                         return []
                     
-                    query_embedding = self.generate_embedding(results[0][0])
+                    query_embedding = self._generate_array(results[0][0])
                 else:
                     return []
                 
+                # Normalize the query once; cosine against stored unit vectors is then a dot product
+                query = _unit_vector(query_embedding)
+                
                 # Use vector database for scalable search if available
                 if vector_db.enabled:
                     filter_dict = None
@@ -240,7 +615,7 @@ class EmbeddingService:
                         # Exclude the query item itself
                         filter_dict = {"item_id": {"$ne": summary_id}}
                     
-                    vector_results = vector_db.query_similar(query_embedding, top_k, filter_dict)
+                    vector_results = vector_db.query_similar(query_embedding.tolist(), top_k, filter_dict)
                     
                     # Format results
                     similarities = []
@@ -253,41 +628,36 @@ class EmbeddingService:
                         })
                     return similarities
                 
-                # Fallback to database search
-                # Get all embeddings from database
-                results = db_manager.execute_query_all('''
-                    SELECT item_type, item_id, vector_blob, text_content
-                    FROM embeddings
-                ''')
-                
-                # Calculate similarities
-                similarities = []
-                for item_type, item_id, vector_blob, text_content in results:
-                    try:
-                        # Skip items with no text
-                        if not text_content:
-                            continue
-                        
-                        # Skip the query item itself if searching by summary_id
-                        if summary_id and item_id == summary_id and item_type == 'summary':
-                            continue
-                        
-                        item_embedding = json.loads(vector_blob)
-                        similarity = self.cosine_similarity(query_embedding, item_embedding)
-                        
+                # KNN inside SQLite via the sqlite-vec index
+                if db_manager.vec_enabled:
+                    # One extra neighbour covers the query summary matching itself
+                    rows = db_manager.knn_search(pack_vector(query), top_k + 1 if summary_id else top_k, summary_id)
+                    similarities = []
+                    for item_type, item_id, text_content, distance in rows:
                         similarities.append({
                             'item_type': item_type,
                             'item_id': item_id,
-                            'score': similarity,
-                            'text': text_content[:200] + '...' if len(text_content) > 200 else text_content  # Truncate for display
+                            'score': 1.0 - distance,  # cosine distance metric
+                            'text': text_content[:200] + '...' if len(text_content) > 200 else text_content
                         })
-                    except Exception as e:
-                        logger.error(f"Error processing item {item_id}: {e}")
-                        continue
+                    return similarities[:top_k]
+                
+                # Fallback to a brute-force scan over the cached float32 matrix
+                items, matrix, positions = self._search_matrix(query.size)
                 
-                # Sort by similarity score and return top_k
-                similarities.sort(key=lambda x: x['score'], reverse=True)
-                return similarities[:top_k]
+                # Skip the query item itself if searching by summary_id
+                excluded = positions.get(('summary', summary_id)) if summary_id else None
+                
+                similarities = []
+                for i, score in _top_k_rows(matrix, query, top_k, excluded):
+                    item_type, item_id, text_content = items[i]
+                    similarities.append({
+                        'item_type': item_type,
+                        'item_id': item_id,
+                        'score': score,
+                        'text': text_content[:200] + '...' if len(text_content) > 200 else text_content  # Truncate for display
+                    })
+                return similarities
                 
             except CircuitBreakerOpenException:
                 logger.error("Circuit breaker is open, cannot search similar items")
@@ -303,6 +673,53 @@ class EmbeddingService:
         except Exception:
             return []
     
+    def _search_matrix(self, dimension: int):
+        """
+        Return (items, matrix, positions) for every searchable stored embedding.
+
+        items holds (item_type, item_id, text_content) per row of the contiguous
+        float32 matrix of unit vectors, positions maps (item_type, item_id) to
+        its row; rows stored before vectors were normalized at insert are
+        normalized here, once per rebuild. The result is cached and rebuilt
+        after store_embedding() or when the table's row count, highest id or
+        latest timestamp shows another writer changed it.
+        """
+        signature = tuple(db_manager.execute_query(
+            'SELECT COUNT(*), MAX(id), MAX(timestamp) FROM embeddings'
+        )[0]) + (dimension,)
+        cache = self._search_cache
+        if cache is not None and cache[0] == signature:
+            return cache[1]
+        
+        items = []
+        vectors = []
+        # Items with no text are never returned, so SQLite skips them
+        for item_type, item_id, vector_blob, text_content in db_manager.execute_query_all('''
+            SELECT item_type, item_id, vector_blob, text_content
+            FROM embeddings
+            WHERE text_content IS NOT NULL AND text_content != ''
+        '''):
+            try:
+                item_embedding = unpack_vector(vector_blob)
+            except ValueError as e:
+                logger.error(f"Error decoding item {item_id}: {e}")
+                continue
+            if item_embedding.size != dimension:
+                logger.error(f"Skipping item {item_id}: dimension {item_embedding.size} != {dimension}")
+                continue
+            items.append((item_type, item_id, text_content))
+            vectors.append(item_embedding)
+        
+        # Kept in float32: NumPy has no BLAS path for float16, so a float16
+        # matrix-vector product runs as a plain loop and is far slower
+        matrix = np.stack(vectors) if vectors else np.empty((0, dimension), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        positions = {(item_type, item_id): i for i, (item_type, item_id, _) in enumerate(items)}
+        result = (items, matrix, positions)
+        self._search_cache = (signature, result)
+        return result
+    
     def index_existing_summaries(self) -> int:
         """Index all existing summaries that don't have embeddings yet."""
         def _index_summaries():
@@ -315,11 +732,9 @@ class EmbeddingService:
                     WHERE e.id IS NULL
                 ''')
                 
-                unindexed_summaries = results
-                indexed_count = 0
-                for summary_id, summary_text in unindexed_summaries:
-                    if self.store_embedding('summary', summary_id, summary_text):
-                        indexed_count += 1
+                indexed_count = self.store_embeddings_bulk(
+                    [('summary', summary_id, summary_text) for summary_id, summary_text in results]
+                )
                 
                 logger.info(f"Indexed {indexed_count} summaries")
                 return indexed_count
@@ -350,11 +765,9 @@ class EmbeddingService:
                     WHERE e.id IS NULL
                 ''')
                 
-                unindexed_tasks = results
-                indexed_count = 0
-                for task_id, task_text in unindexed_tasks:
-                    if self.store_embedding('task', task_id, task_text):
-                        indexed_count += 1
+                indexed_count = self.store_embeddings_bulk(
+                    [('task', task_id, task_text) for task_id, task_text in results]
+                )
                 
                 logger.info(f"Indexed {indexed_count} tasks")
                 return indexed_count
@@ -373,5 +786,41 @@ class EmbeddingService:
         except Exception:
             return 0
 
+    async def index_existing_summaries_async(self, concurrency: int = 10) -> int:
+        """Async index_existing_summaries, storing up to concurrency summaries at a time."""
+        try:
+            results = await asyncio.to_thread(db_manager.execute_query_all, '''
+                SELECT s.summary_id, s.summary_text 
+                FROM summaries s
+                LEFT JOIN embeddings e ON s.summary_id = e.item_id AND e.item_type = 'summary'
+                WHERE e.id IS NULL
+            ''')
+            indexed_count = await self.store_embeddings_async(
+                [('summary', summary_id, summary_text) for summary_id, summary_text in results], concurrency
+            )
+            logger.info(f"Indexed {indexed_count} summaries")
+            return indexed_count
+        except Exception as e:
+            logger.error(f"Error indexing existing summaries: {e}")
+            return 0
+    
+    async def index_existing_tasks_async(self, concurrency: int = 10) -> int:
+        """Async index_existing_tasks, storing up to concurrency tasks at a time."""
+        try:
+            results = await asyncio.to_thread(db_manager.execute_query_all, '''
+                SELECT t.task_id, t.task_text 
+                FROM tasks t
+                LEFT JOIN embeddings e ON t.task_id = e.item_id AND e.item_type = 'task'
+                WHERE e.id IS NULL
+            ''')
+            indexed_count = await self.store_embeddings_async(
+                [('task', task_id, task_text) for task_id, task_text in results], concurrency
+            )
+            logger.info(f"Indexed {indexed_count} tasks")
+            return indexed_count
+        except Exception as e:
+            logger.error(f"Error indexing existing tasks: {e}")
+            return 0
+
 # Global instance for use in API
 embedding_service = EmbeddingService()
\ No newline at end of file
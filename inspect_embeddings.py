@@ -6,7 +6,33 @@ This script inspects embeddings stored in the database.
 """
 
 import sqlite3
-import json
+
+import numpy as np
+
+# Try to use orjson for faster float-array parsing, with fallback
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+def _decode_vector(value) -> np.ndarray:
+    """Decode a stored vector from either a float64 BLOB (zero-copy) or legacy JSON text."""
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=np.float64)
+    return np.asarray(json_loads(value), dtype=np.float64)
+
+
+def _sample_values(value, count: int = 5) -> list:
+    """First count values of a vector prefix (BLOB bytes) or legacy JSON text."""
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=np.float64, count=min(count, len(value) // 8)).tolist()
+    return np.asarray(json_loads(value)[:count], dtype=np.float64).tolist()
+
+
+def _vector_column(conn: sqlite3.Connection) -> str:
+    """Newer tables store vectors in a BLOB column, older ones as JSON text."""
+    columns = {col[1] for col in conn.execute("PRAGMA table_info(embeddings)")}
+    return "vector_blob" if "vector_blob" in columns else "vector_json"
 
 def inspect_embeddings(db_path: str = "assistant_core.db", limit: int = 10):
     """Inspect embeddings in the database."""
@@ -17,9 +43,18 @@ def inspect_embeddings(db_path: str = "assistant_core.db", limit: int = 10):
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        # Get embeddings
-        cursor.execute("""
-            SELECT trace_id, text, vector_json, created_at 
+        # Get embeddings. SQLite works out the dimension (8 bytes per element for
+        # blobs, one more element than there are commas for JSON) and returns only
+        # the first 5 elements' bytes of a blob, so no full vector is decoded.
+        column = _vector_column(conn)
+        cursor.execute(f"""
+            SELECT trace_id, text,
+                   CASE typeof({column}) WHEN 'blob' THEN substr({column}, 1, 40) ELSE {column} END,
+                   CASE typeof({column})
+                       WHEN 'blob' THEN length({column}) / 8
+                       ELSE length({column}) - length(replace({column}, ',', '')) + 1
+                   END,
+                   created_at 
             FROM embeddings 
             ORDER BY created_at DESC 
             LIMIT ?
@@ -34,14 +69,12 @@ def inspect_embeddings(db_path: str = "assistant_core.db", limit: int = 10):
         
         print(f"Found {len(rows)} embeddings:")
         
-        for i, (trace_id, text, vector_json, created_at) in enumerate(rows, 1):
-            vector = json.loads(vector_json)
-            
+        for i, (trace_id, text, vector_sample, dimensions, created_at) in enumerate(rows, 1):
             print(f"\n{i}. Trace ID: {trace_id}")
             print(f"   Text: {text[:60]}{'...' if len(text) > 60 else ''}")
-            print(f"   Dimensions: {len(vector)}")
+            print(f"   Dimensions: {dimensions}")
             print(f"   Created: {created_at}")
-            print(f"   Sample values: {vector[:5]}")
+            print(f"   Sample values: {_sample_values(vector_sample)}")
         
         conn.close()
         return True
@@ -60,8 +93,8 @@ def inspect_embedding_by_trace_id(trace_id: str, db_path: str = "assistant_core.
         cursor = conn.cursor()
         
         # Get specific embedding
-        cursor.execute("""
-            SELECT trace_id, text, vector_json, created_at 
+        cursor.execute(f"""
+            SELECT trace_id, text, {_vector_column(conn)}, created_at 
             FROM embeddings 
             WHERE trace_id = ?
         """, (trace_id,))
@@ -73,14 +106,14 @@ def inspect_embedding_by_trace_id(trace_id: str, db_path: str = "assistant_core.
             conn.close()
             return False
         
-        trace_id, text, vector_json, created_at = row
-        vector = json.loads(vector_json)
+        trace_id, text, vector_data, created_at = row
+        vector = _decode_vector(vector_data)
         
         print(f"Trace ID: {trace_id}")
         print(f"Text: {text}")
         print(f"Dimensions: {len(vector)}")
         print(f"Created: {created_at}")
-        print(f"All values: {vector}")
+        print(f"All values: {vector.tolist()}")
         
         conn.close()
         return True
@@ -47,6 +47,9 @@ class KeyStore:
             master_key (bytes, optional): Master key for encryption. If None, will be generated or loaded.
         """
         self.db_path = db_path
+        # Bumped whenever this instance stores a new key, so callers that
+        # memoize keys can include it in their cache key
+        self.key_version = 0
         self._initialize_database()
         
         if master_key is None:
@@ -187,6 +190,7 @@ class KeyStore:
                 ''', (user_id, encrypted_key))
                 
                 conn.commit()
+                self.key_version += 1
                 logger.info(f"Generated and stored key for user: {user_id}")
             
             return user_key
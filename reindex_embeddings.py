@@ -9,6 +9,26 @@ import sqlite3
 import json
 from datetime import datetime
 
+import numpy as np
+
+# Try to use orjson for faster float-array parsing, with fallback
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+def _decode_vector(value) -> np.ndarray:
+    """Decode a stored vector from either a float64 BLOB or legacy JSON text."""
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=np.float64)
+    return np.asarray(json_loads(value), dtype=np.float64)
+
+
+def _vector_column(conn: sqlite3.Connection) -> str:
+    """Newer tables store vectors in a BLOB column, older ones as JSON text."""
+    columns = {col[1] for col in conn.execute("PRAGMA table_info(embeddings)")}
+    return "vector_blob" if "vector_blob" in columns else "vector_json"
+
 def reindex_embeddings(db_path: str = "assistant_core.db"):
     """Reindex embeddings in the database."""
     try:
@@ -47,8 +67,8 @@ def reindex_embeddings(db_path: str = "assistant_core.db"):
         
         # In this simple case, we're just verifying the data structure
         # In a real reindexing scenario, we might rebuild indexes or reorganize data
-        cursor.execute("""
-            SELECT id, trace_id, text, vector_json, created_at 
+        cursor.execute(f"""
+            SELECT id, trace_id, text, {_vector_column(conn)}, created_at 
             FROM embeddings
         """)
         
@@ -56,17 +76,19 @@ def reindex_embeddings(db_path: str = "assistant_core.db"):
         processed = 0
         
         for row in rows:
-            id, trace_id, text, vector_json, created_at = row
+            id, trace_id, text, vector_data, created_at = row
             
-            # Verify JSON structure
+            # Verify the BLOB or legacy JSON structure
             try:
-                vector = json.loads(vector_json)
-                if not isinstance(vector, list):
-                    print(f"Warning: Invalid vector format in record {id}")
-                    continue
+                vector = _decode_vector(vector_data)
             except json.JSONDecodeError:
                 print(f"Warning: Invalid JSON in record {id}")
                 continue
+            except (TypeError, ValueError):
+                vector = None
+            if vector is None or vector.ndim != 1:
+                print(f"Warning: Invalid vector format in record {id}")
+                continue
             
             processed += 1
             if processed % 100 == 0:
@@ -5,15 +5,15 @@ This module contains comprehensive tests for the assistant_pipeline module.
 """
 
 import os
-import json
 import sys
 from typing import Dict, List
 import sqlite3
 
 # Import the module to test
-from assistant_pipeline import process_message
+from assistant_pipeline import process_message, process_message_result, ProcessResult
 from embedcore_v3 import generate_embedding, obfuscate, deobfuscate
 from keystore import KeyStore
+from embed_logger import flush_csv_log, load_embedding
 
 
 def test_same_message_same_key_same_user():
@@ -98,7 +98,7 @@ def test_database_writing():
     assert row[2] == platform
     
     # Check that the obfuscated embedding matches
-    stored_embedding = json.loads(row[3])
+    stored_embedding = load_embedding(row[3])
     assert stored_embedding == result["obfuscated_embedding"]
     
     conn.close()
@@ -116,6 +116,7 @@ def test_csv_writing():
     assert result["status"] == "success"
     
     # Check CSV file
+    flush_csv_log()
     assert os.path.exists("embedding_log.csv"), "CSV file should exist"
     
     with open("embedding_log.csv", "r") as f:
@@ -162,6 +163,25 @@ def test_structured_response():
     assert isinstance(result["timestamp"], str)
 
 
+def test_struct_response():
+    """Test that process_message_result mirrors the dict response."""
+    user_id = "struct_test_user"
+    session_id = "struct_test_session"
+    platform = "struct_test_platform"
+    message = "This is a test message for the struct response"
+    
+    result = process_message_result(user_id, session_id, platform, message)
+    assert isinstance(result, ProcessResult)
+    assert result.status == "success"
+    assert result.user_id == user_id
+    
+    # Same fields and values as the dict response, apart from the timestamp
+    as_dict = process_message(user_id, session_id, platform, message)
+    assert set(result._fields) == set(as_dict)
+    assert result.embedding == as_dict["embedding"]
+    assert result.obfuscated_embedding == as_dict["obfuscated_embedding"]
+
+
 def test_obfuscation_reversibility():
     """Test that obfuscation -> deobfuscation is reversible."""
     user_id = "reversibility_test_user"
@@ -190,6 +210,54 @@ def test_obfuscation_reversibility():
             assert abs(deobfuscated[i] - original[i]) < 1e-10, f"Value at index {i} should match"
 
 
+def test_deobfuscation_after_keystore_rotation():
+    """Test that a rotation through keystore.rotate_key is used by the next message."""
+    import keystore as keystore_module
+    
+    user_id = "rotation_test_user"
+    message = "This is a test message for key rotation"
+    
+    # Populate the cached key, then rotate it behind the pipeline's back
+    before = process_message(user_id, "rotation_session_1", "rotation_platform", message)
+    assert before["status"] == "success"
+    old_key = keystore_module.get_key(user_id).decode()
+    new_key = keystore_module.rotate_key(user_id).decode()
+    assert new_key != old_key
+    
+    after = process_message(user_id, "rotation_session_2", "rotation_platform", message)
+    assert after["status"] == "success"
+    
+    # The new obfuscated embedding must restore with the new key
+    restored = deobfuscate(after["obfuscated_embedding"], new_key)
+    for original, value in zip(after["embedding"], restored):
+        assert abs(value - original) < 1e-10
+
+
+def test_search_embeddings_skips_deleted_rows():
+    """Test that search_embeddings never returns an id whose row was deleted."""
+    import tempfile
+    from embed_logger import save_embedding, search_embeddings
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "search.db")
+        messages = ["Search test message one", "Search test message two", "Search test message three"]
+        for i, message in enumerate(messages):
+            assert save_embedding("search_user", f"search_session_{i}", generate_embedding(message), db_path=db_path)
+        
+        query = generate_embedding(messages[0])
+        nearest_id = search_embeddings(query, k=3, db_path=db_path)[0][0]
+        
+        # Delete the nearest row on a separate connection, as external cleanup would
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM embeddings WHERE id = ?", (nearest_id,))
+        conn.commit()
+        conn.close()
+        
+        results = search_embeddings(query, k=3, db_path=db_path)
+        assert len(results) == 2
+        assert nearest_id not in [row_id for row_id, _ in results]
+
+
 def test_input_validation():
     """Test input validation."""
     # Test with invalid types - we'll catch the exceptions
@@ -256,7 +324,10 @@ if __name__ == "__main__":
         test_database_writing,
         test_csv_writing,
         test_structured_response,
+        test_struct_response,
         test_obfuscation_reversibility,
+        test_deobfuscation_after_keystore_rotation,
+        test_search_embeddings_skips_deleted_rows,
         test_input_validation,
         test_error_handling
     ]
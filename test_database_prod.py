@@ -0,0 +1,273 @@
+"""
+Tests for the sqlite-vec search path in database_prod.py.
+
+Where sqlite-vec cannot be loaded, the vec0 index is stood in for by a plain
+embeddings_vec table and a NumPy knn_search that, like sqlite-vec, picks the
+k nearest indexed rows before the join back to embeddings.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import embedding_service
+from database_prod import DatabaseManager, pack_vector, unpack_vector, VECTOR_DIMENSION
+
+
+def _require_sqlite_vec() -> None:
+    """Skip the calling test unless sqlite-vec is installed and this Python's sqlite3 can load it."""
+    try:
+        import sqlite_vec
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.enable_load_extension(True)
+            sqlite_vec.load(conn)
+        finally:
+            conn.close()
+    except (ImportError, AttributeError, sqlite3.Error) as e:
+        raise unittest.SkipTest(f"sqlite-vec cannot be loaded: {e}")
+
+
+def _stub_vec_database(db_path: str) -> DatabaseManager:
+    """Return an initialized DatabaseManager with vec_enabled and an emulated knn_search."""
+    db = DatabaseManager(db_path)
+    db.initialize()
+    db.execute_update("CREATE TABLE embeddings_vec (embedding BLOB)")
+    db.vec_enabled = True
+
+    def knn_search(query_blob, k, exclude_summary_id=None):
+        query = unpack_vector(query_blob)
+        indexed = db.execute_query("SELECT rowid, embedding FROM embeddings_vec")
+        distances = sorted(
+            (1.0 - float(np.dot(query, unpack_vector(blob)))
+             / float(np.linalg.norm(query) * np.linalg.norm(unpack_vector(blob))), row_id)
+            for row_id, blob in indexed
+        )[:k]
+        rows = []
+        for distance, row_id in distances:
+            item_type, item_id, text_content = db.execute_query(
+                "SELECT item_type, item_id, text_content FROM embeddings WHERE id = :id", {"id": row_id})[0]
+            if not text_content or (item_type == 'summary' and item_id == exclude_summary_id):
+                continue
+            rows.append((item_type, item_id, text_content, distance))
+        return rows
+
+    db.knn_search = knn_search
+    return db
+
+
+def test_vec_search_skips_rows_without_text():
+    """
+    Test that rows stored without text never take a top_k slot in vec search.
+
+    The empty-text rows carry the query's own vector, so they would be the
+    nearest neighbours if they were indexed.
+    """
+    service = embedding_service.embedding_service
+    original_db = embedding_service.db_manager
+    with tempfile.TemporaryDirectory() as tmp:
+        db = _stub_vec_database(os.path.join(tmp, "vec.db"))
+        embedding_service.db_manager = db
+        try:
+            query_text = "renew the passport before the trip"
+            query_blob = pack_vector(service.encode_many([query_text])[0])
+            timestamp = datetime.now().isoformat()
+
+            db.bulk_ingest_embeddings([("note", f"blank-{i}", query_blob, timestamp, "") for i in range(4)])
+            db.upsert_embedding("note", "blank-upsert", query_blob, timestamp, None)
+            assert service.store_embeddings_bulk([
+                ("task", "t1", "book flights for the trip"),
+                ("task", "t2", "renew the passport"),
+                ("task", "t3", "pack for the trip"),
+                ("task", "t4", None),
+            ]) == 4
+
+            indexed = {row[0] for row in db.execute_query(
+                "SELECT e.item_id FROM embeddings_vec v JOIN embeddings e ON e.id = v.rowid")}
+            assert indexed == {"t1", "t2", "t3"}
+
+            results = service.search_similar_items(query_text=query_text, top_k=3)
+            assert len(results) == 3
+            assert {r["item_id"] for r in results} == {"t1", "t2", "t3"}
+        finally:
+            embedding_service.db_manager = original_db
+            db.close()
+
+    print("✓ test_vec_search_skips_rows_without_text passed")
+
+
+def test_bulk_ingest_small_batch_keeps_timestamp_index():
+    """
+    Test that a small incremental batch is upserted without rebuilding the
+    timestamp index, with the same last-row-wins result as a large batch.
+    """
+    blob = pack_vector(np.ones(VECTOR_DIMENSION))
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "bulk.db"))
+        try:
+            db.initialize()
+            assert db.bulk_ingest_embeddings(
+                [("task", f"t{i}", blob, "ts", f"task {i}") for i in range(40)]) == 40
+
+            index_sql = "SELECT rootpage FROM sqlite_master WHERE name = 'idx_embeddings_timestamp'"
+            rootpage = db.execute_query(index_sql)[0][0]
+            assert db.bulk_ingest_embeddings([
+                ("task", "t1", blob, "ts", "first"),
+                ("task", "t1", blob, "ts", "second"),
+                ("task", "t99", blob, "ts", "new"),
+            ]) == 2
+            assert db.execute_query(index_sql)[0][0] == rootpage
+
+            rows = dict(db.execute_query(
+                "SELECT item_id, text_content FROM embeddings WHERE item_id IN ('t1', 't99')"))
+            assert rows == {"t1": "second", "t99": "new"}
+            assert db.execute_query("SELECT count(*) FROM embeddings")[0][0] == 41
+        finally:
+            db.close()
+
+    print("✓ test_bulk_ingest_small_batch_keeps_timestamp_index passed")
+
+
+def test_vec_knn_search_returns_cosine_distance():
+    """
+    Test the real vec0 index: upserts and bulk ingests keep it in step and
+    knn_search returns the nearest rows with 1 - distance equal to cosine.
+
+    Skipped unless sqlite-vec loads into this Python's sqlite3.
+    """
+    _require_sqlite_vec()
+
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(8, VECTOR_DIMENSION)).astype(np.float32)
+    query = rng.normal(size=VECTOR_DIMENSION).astype(np.float32)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "vec.db"))
+        try:
+            db.initialize()
+            assert db.vec_enabled
+
+            for i, vector in enumerate(vectors[:4]):
+                db.upsert_embedding("task", f"t{i}", pack_vector(vector), "ts", f"task {i}")
+            db.bulk_ingest_embeddings(
+                [("summary", f"s{i}", pack_vector(vectors[i]), "ts", f"summary {i}") for i in range(4, 8)])
+            # Clearing the text takes the row out of the index
+            db.upsert_embedding("task", "t0", pack_vector(vectors[0]), "ts", "")
+            assert db.execute_query("SELECT count(*) FROM embeddings_vec")[0][0] == 7
+
+            cosine = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+            expected = [i for i in np.argsort(-cosine) if i != 0][:3]
+            rows = db.knn_search(pack_vector(query), 3)
+            assert [item_id for _, item_id, _, _ in rows] == [("t" if i < 4 else "s") + str(i) for i in expected]
+            for (_, _, _, distance), i in zip(rows, expected):
+                assert abs((1.0 - distance) - cosine[i]) < 1e-5
+
+            excluded = next(f"s{i}" for i in expected if i >= 4)
+            rows = db.knn_search(pack_vector(query), 3, excluded)
+            assert excluded not in [item_id for _, item_id, _, _ in rows]
+        finally:
+            db.close()
+
+    print("✓ test_vec_knn_search_returns_cosine_distance passed")
+
+
+def test_vec_search_similar_items_uses_real_index():
+    """
+    Test search_similar_items end to end through the real knn_search SQL.
+
+    Skipped unless sqlite-vec loads into this Python's sqlite3.
+    """
+    _require_sqlite_vec()
+
+    service = embedding_service.embedding_service
+    original_db = embedding_service.db_manager
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, "vec.db"))
+        db.initialize()
+        assert db.vec_enabled
+        embedding_service.db_manager = db
+        try:
+            assert service.store_embeddings_bulk([
+                ("task", "t1", "book flights for the trip"),
+                ("task", "t2", "renew the passport"),
+                ("task", "t3", "pack for the trip"),
+                ("task", "t4", None),
+                ("summary", "s1", "renew the passport before the trip"),
+            ]) == 5
+
+            results = service.search_similar_items(query_text="renew the passport before the trip", top_k=3)
+            assert len(results) == 3
+            assert results[0]["item_id"] == "s1"
+            assert results[0]["score"] > 0.99
+            assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+
+            results = service.search_similar_items(summary_id="s1", top_k=3)
+            assert len(results) == 3
+            assert "s1" not in [r["item_id"] for r in results]
+        finally:
+            embedding_service.db_manager = original_db
+            db.close()
+
+    print("✓ test_vec_search_similar_items_uses_real_index passed")
+
+
+def test_vec_index_drops_orphaned_rows_on_initialize():
+    """
+    Test that initialize() removes embeddings_vec entries whose embeddings row
+    was deleted behind DatabaseManager's back.
+
+    Skipped unless sqlite-vec loads into this Python's sqlite3.
+    """
+    _require_sqlite_vec()
+
+    vectors = np.random.default_rng(11).normal(size=(4, VECTOR_DIMENSION)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "vec.db")
+        db = DatabaseManager(db_path)
+        try:
+            db.initialize()
+            for i, vector in enumerate(vectors):
+                db.upsert_embedding("summary" if i % 2 else "task", f"item-{i}", pack_vector(vector), "ts", f"text {i}")
+        finally:
+            db.close()
+
+        # As rebuild_embeddings.clear_existing_embeddings does, on a plain connection
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM embeddings WHERE item_type = 'task'")
+        conn.commit()
+        conn.close()
+
+        db = DatabaseManager(db_path)
+        try:
+            db.initialize()
+            assert db.execute_query("SELECT count(*) FROM embeddings_vec")[0][0] == 2
+            rows = db.knn_search(pack_vector(vectors[0]), 2)
+            assert sorted(item_id for _, item_id, _, _ in rows) == ["item-1", "item-3"]
+        finally:
+            db.close()
+
+    print("✓ test_vec_index_drops_orphaned_rows_on_initialize passed")
+
+
+if __name__ == "__main__":
+    try:
+        for test in (test_vec_search_skips_rows_without_text,
+                     test_vec_knn_search_returns_cosine_distance,
+                     test_vec_search_similar_items_uses_real_index,
+                     test_vec_index_drops_orphaned_rows_on_initialize,
+                     test_bulk_ingest_small_batch_keeps_timestamp_index):
+            try:
+                test()
+            except unittest.SkipTest as e:
+                print(f"- {test.__name__} skipped: {e}")
+
+        print("All tests passed!")
+    except Exception as e:
+        print(f"Test failed: {e}")
+        sys.exit(1)
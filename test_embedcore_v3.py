@@ -11,7 +11,11 @@ import os
 # Add the parent directory to the path so we can import embedcore_v3
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from embedcore_v3 import generate_embedding, obfuscate, deobfuscate
+from embedcore_v3 import generate_embedding, obfuscate, deobfuscate, secure_embed_batch
+from keystore import KeyStore
+import embedcore_v3_numba
+import embedcore_v3
+import numpy as np
 
 
 def test_obfuscation_reversibility():
@@ -146,6 +150,81 @@ def test_same_message_diff_keys():
     print("✓ test_same_message_diff_keys passed")
 
 
+def test_compiled_obfuscation_matches_reference():
+    """
+    Test that the compiled obfuscation kernels match the reference implementation.
+    
+    Vectors obfuscated by either module must be restorable by the other.
+    """
+    embedding = generate_embedding("Compiled kernel parity test message")
+    user_key = "compiled-parity-key"
+    
+    assert embedcore_v3_numba.obfuscate(embedding, user_key) == obfuscate(embedding, user_key)
+    
+    obfuscated = obfuscate(embedding, user_key)
+    assert embedcore_v3_numba.deobfuscate(obfuscated, user_key) == deobfuscate(obfuscated, user_key)
+    
+    print("✓ test_compiled_obfuscation_matches_reference passed")
+
+
+def test_secure_embed_batch_matches_single():
+    """
+    Test that batched secure embedding matches the one-at-a-time pipeline.
+    
+    Each row must equal obfuscate(generate_embedding(message), key) for its user.
+    """
+    messages = ["Batch test message one", "Batch test message two", "Batch test message one"]
+    user_ids = ["batch-user-a", "batch-user-b", "batch-user-a"]
+    results = secure_embed_batch(messages, user_ids, ["test"] * 3)
+    
+    assert len(results) == 3
+    keystore = KeyStore()
+    for message, user_id, result in zip(messages, user_ids, results):
+        user_key = keystore.get_key(user_id).decode()
+        assert result["user_id"] == user_id
+        assert result["embedding"] == obfuscate(generate_embedding(message), user_key)
+    
+    print("✓ test_secure_embed_batch_matches_single passed")
+
+
+def _reference_pcg32_row(seed, dim):
+    """Plain-integer PCG32 (XSH-RR) stream mapped to [-1, 1) and normalized."""
+    mult, inc, mask = 6364136223846793005, 109, (1 << 64) - 1
+    state = ((inc + seed) * mult + inc) & mask
+    row = []
+    for _ in range(dim):
+        old = state
+        state = (old * mult + inc) & mask
+        xorshifted = (((old >> 18) ^ old) >> 27) & 0xFFFFFFFF
+        rot = old >> 59
+        bits = ((xorshifted >> rot) | (xorshifted << ((32 - rot) & 31))) & 0xFFFFFFFF
+        row.append(bits * (2.0 / 4294967296.0) - 1.0)
+    row = np.array(row)
+    return row / np.linalg.norm(row)
+
+
+def test_numpy_fallback_matches_compiled_kernel():
+    """
+    Test that the NumPy fallback generator produces the compiled kernel's vectors.
+    
+    Both paths must follow the same PCG32 stream so workers with and without
+    numba agree on every embedding.
+    """
+    seeds = np.array([0, 1, 12345, 2**63 + 17, 2**64 - 1], dtype=np.uint64)
+    fallback = np.empty((len(seeds), 384))
+    embedcore_v3._fill_embeddings_numpy(seeds, fallback)
+    
+    for seed, row in zip(seeds.tolist(), fallback):
+        assert np.max(np.abs(row - _reference_pcg32_row(seed, 384))) < 1e-12
+    
+    if embedcore_v3.NUMBA_AVAILABLE:
+        compiled = np.empty_like(fallback)
+        embedcore_v3._fill_embeddings(seeds, compiled)
+        assert np.max(np.abs(compiled - fallback)) < 1e-12
+    
+    print("✓ test_numpy_fallback_matches_compiled_kernel passed")
+
+
 if __name__ == "__main__":
     # Run the tests
     try:
@@ -164,6 +243,12 @@ if __name__ == "__main__":
         test_same_message_diff_keys()
         print("✓ test_same_message_diff_keys passed")
         
+        test_compiled_obfuscation_matches_reference()
+        
+        test_secure_embed_batch_matches_single()
+        
+        test_numpy_fallback_matches_compiled_kernel()
+        
         print("All tests passed!")
     except Exception as e:
         print(f"Test failed: {e}")
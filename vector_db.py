@@ -1,6 +1,6 @@
 import os
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import time
 
 logger = logging.getLogger(__name__)
@@ -57,6 +57,22 @@ class VectorDB:
             logger.error(f"Failed to upsert embedding {item_id}: {e}")
             return False
 
+    def upsert_batch(self, entries: List[Tuple[str, List[float], Dict[str, Any]]], batch_size: int = 100) -> bool:
+        """Upsert many (item_id, vector, metadata) embeddings, batch_size per request."""
+        if not self.enabled or not self._index:
+            return False
+
+        try:
+            for start in range(0, len(entries), batch_size):
+                self._index.upsert(vectors=[
+                    {"id": item_id, "values": vector, "metadata": metadata}
+                    for item_id, vector, metadata in entries[start:start + batch_size]
+                ])
+            return True
+        except Exception as e:
+            logger.error(f"Failed to upsert {len(entries)} embeddings: {e}")
+            return False
+
     def query_similar(self, vector: List[float], top_k: int = 10, filter: Optional[Dict] = None) -> List[Dict]:
         """Query for similar embeddings."""
         if not self.enabled or not self._index:
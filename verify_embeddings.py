@@ -9,6 +9,24 @@ import sqlite3
 import json
 import numpy as np
 
+# Try to use orjson for faster float-array parsing, with fallback
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+def _decode_vector(value) -> np.ndarray:
+    """Decode a stored vector from either a float64 BLOB or legacy JSON text."""
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=np.float64)
+    return np.asarray(json_loads(value), dtype=np.float64)
+
+
+def _vector_column(conn: sqlite3.Connection) -> str:
+    """Newer tables store vectors in a BLOB column, older ones as JSON text."""
+    columns = {col[1] for col in conn.execute("PRAGMA table_info(embeddings)")}
+    return "vector_blob" if "vector_blob" in columns else "vector_json"
+
 def verify_embeddings(db_path: str = "assistant_core.db"):
     """Verify the integrity of embeddings in the database."""
     try:
@@ -33,7 +51,7 @@ def verify_embeddings(db_path: str = "assistant_core.db"):
         print("✓ Embeddings table exists")
         
         # Get all embeddings
-        cursor.execute("SELECT id, trace_id, vector_json FROM embeddings")
+        cursor.execute(f"SELECT id, trace_id, {_vector_column(conn)} FROM embeddings")
         rows = cursor.fetchall()
         
         if not rows:
@@ -46,46 +64,38 @@ def verify_embeddings(db_path: str = "assistant_core.db"):
         valid_count = 0
         invalid_count = 0
         
-        for id, trace_id, vector_json in rows:
+        for id, trace_id, vector_data in rows:
             try:
-                # Parse JSON
-                vector = json.loads(vector_json)
+                # Decode the BLOB or parse legacy JSON
+                vector_array = _decode_vector(vector_data)
                 
-                # Check if it's a list
-                if not isinstance(vector, list):
+                # Check it's a flat vector
+                if vector_array.ndim != 1:
                     print(f"❌ Invalid format in record {id} (trace_id: {trace_id})")
                     invalid_count += 1
                     continue
                 
-                # Check if all elements are numbers
-                valid_vector = True
-                for i, val in enumerate(vector):
-                    if not isinstance(val, (int, float)):
-                        print(f"❌ Non-numeric value at index {i} in record {id} (trace_id: {trace_id})")
-                        valid_vector = False
-                        break
-                
-                if valid_vector:
-                    # Check for reasonable values (not all zeros, not NaN, not infinite)
-                    vector_array = np.array(vector)
-                    if np.isnan(vector_array).any():
-                        print(f"❌ NaN values found in record {id} (trace_id: {trace_id})")
-                        invalid_count += 1
-                    elif np.isinf(vector_array).any():
-                        print(f"❌ Infinite values found in record {id} (trace_id: {trace_id})")
-                        invalid_count += 1
-                    elif np.all(vector_array == 0):
-                        print(f"⚠️  All-zero vector in record {id} (trace_id: {trace_id})")
-                        # Not necessarily invalid, but worth noting
-                        valid_count += 1
-                    else:
-                        valid_count += 1
-                else:
+                # Check for reasonable values (not all zeros, not NaN, not infinite)
+                if np.isnan(vector_array).any():
+                    print(f"❌ NaN values found in record {id} (trace_id: {trace_id})")
+                    invalid_count += 1
+                elif np.isinf(vector_array).any():
+                    print(f"❌ Infinite values found in record {id} (trace_id: {trace_id})")
                     invalid_count += 1
+                elif np.all(vector_array == 0):
+                    print(f"⚠️  All-zero vector in record {id} (trace_id: {trace_id})")
+                    # Not necessarily invalid, but worth noting
+                    valid_count += 1
+                else:
+                    valid_count += 1
                     
             except json.JSONDecodeError:
                 print(f"❌ Invalid JSON in record {id} (trace_id: {trace_id})")
                 invalid_count += 1
+            except (TypeError, ValueError):
+                # JSON that is not a list of numbers
+                print(f"❌ Invalid format in record {id} (trace_id: {trace_id})")
+                invalid_count += 1
             except Exception as e:
                 print(f"❌ Error processing record {id} (trace_id: {trace_id}): {e}")
                 invalid_count += 1
@@ -119,7 +129,7 @@ def verify_embedding_dimensions(db_path: str = "assistant_core.db", expected_dim
         cursor = conn.cursor()
         
         # Get all embeddings
-        cursor.execute("SELECT id, trace_id, vector_json FROM embeddings")
+        cursor.execute(f"SELECT id, trace_id, {_vector_column(conn)} FROM embeddings")
         rows = cursor.fetchall()
         
         if not rows:
@@ -132,9 +142,9 @@ def verify_embedding_dimensions(db_path: str = "assistant_core.db", expected_dim
         correct_dim_count = 0
         incorrect_dim_count = 0
         
-        for id, trace_id, vector_json in rows:
+        for id, trace_id, vector_data in rows:
             try:
-                vector = json.loads(vector_json)
+                vector = _decode_vector(vector_data)
                 
                 if len(vector) == expected_dim:
                     correct_dim_count += 1